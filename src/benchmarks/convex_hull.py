@@ -0,0 +1,74 @@
+"""Compare Graham_scan with the insertion-sort implementation it replaced.
+Run from "src": python -m benchmarks.convex_hull
+"""
+import random
+import timeit
+
+from starapp.geometry import Graham_scan
+
+SIZES: tuple[int, ...] = (10, 100, 1000, 5000)
+REPEAT: int = 3
+
+
+def insertion_sort_Graham_scan(
+    points: list[dict[str, float]]
+) -> list[dict[str, float]]:
+    def is_right_rotate(
+        a: dict[str, float], b: dict[str, float], c: dict[str, float]
+    ) -> bool:
+        result = (b["ra"] - a["ra"]) * (c["dec"] - b["dec"]) - (b["dec"] - a["dec"]) * (
+            c["ra"] - b["ra"]
+        )
+        if result < 0:
+            return True
+        else:
+            return False
+
+    length: int = len(points)
+
+    for i in range(1, length):
+        if points[0]["dec"] > points[i]["dec"]:
+            points[0], points[i] = points[i], points[0]
+
+    for i in range(2, length):
+        j = i
+        while j > 1 and is_right_rotate(points[0], points[j - 1], points[j]):
+            points[j], points[j - 1] = points[j - 1], points[j]
+            j -= 1
+
+    answer: list[dict[str, float]] = [points[0], points[1]]
+    for i in range(2, length):
+        while is_right_rotate(answer[-2], answer[-1], points[i]):
+            del answer[-1]
+        answer.append(points[i])
+
+    return answer
+
+
+def random_points(size: int) -> list[dict[str, float]]:
+    return [
+        {"ra": random.uniform(0, 24), "dec": random.uniform(-90, 90)}
+        for i in range(size)
+    ]
+
+
+def main() -> None:
+    random.seed(0)
+    print(f"{'points':>8} {'insertion sort, s':>18} {'Graham_scan, s':>15}")
+    for size in SIZES:
+        points = random_points(size)
+        old_time = min(
+            timeit.repeat(
+                lambda: insertion_sort_Graham_scan(list(points)),
+                number=1,
+                repeat=REPEAT,
+            )
+        )
+        new_time = min(
+            timeit.repeat(lambda: Graham_scan(points), number=1, repeat=REPEAT)
+        )
+        print(f"{size:>8} {old_time:>18.6f} {new_time:>15.6f}")
+
+
+if __name__ == "__main__":
+    main()
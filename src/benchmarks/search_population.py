@@ -0,0 +1,77 @@
+"""Count Redis round trips needed to build the Search structures of a
+selection, for the per-star HSET/RPUSH layout and for Search.
+Run from "src": python -m benchmarks.search_population
+"""
+import random
+import timeit
+from typing import Any, Callable
+from unittest.mock import patch
+
+from fakeredis import FakeStrictRedis
+from redis.connection import Connection
+
+from starapp.algorithms import Search, TypeSearch
+
+SIZES: tuple[int, ...] = (100, 1000, 20000)
+
+
+def per_star_population(hash_: str, stars: list[dict[str, Any]]) -> None:
+    redis_ = FakeStrictRedis(decode_responses=True)
+    for type_search in TypeSearch:
+        sorted_stars = sorted(stars, key=lambda star: star[type_search.value])
+        for star in sorted_stars:
+            name_of_hash = hash_ + ":" + type_search.value + ":" + str(star["id"])
+            redis_.hset(
+                name_of_hash,
+                mapping={"name": str(star["id"]), "value": star[type_search.value]},
+            )
+            redis_.rpush(hash_ + ":" + type_search.value, name_of_hash)
+
+
+def search_population(hash_: str, stars: list[dict[str, Any]]) -> None:
+    for type_search in TypeSearch:
+        Search(hash_, type_search, stars=stars)
+
+
+def measure(
+    population: Callable[[str, list[dict[str, Any]]], None],
+    stars: list[dict[str, Any]],
+    hash_: str,
+) -> tuple[int, float]:
+    round_trips: list[int] = []
+    send_packed_command = Connection.send_packed_command
+
+    def count_round_trips(connection: Connection, *args: Any, **kwargs: Any) -> None:
+        round_trips.append(1)
+        send_packed_command(connection, *args, **kwargs)
+
+    with patch.object(Connection, "send_packed_command", count_round_trips):
+        time = timeit.timeit(lambda: population(hash_, stars), number=1)
+    return len(round_trips), time
+
+
+def main() -> None:
+    random.seed(0)
+    print(f"{'stars':>8} {'per star':>18} {'Search':>18}")
+    with patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis):
+        for size in SIZES:
+            stars = [
+                {
+                    "id": index,
+                    "name": str(index),
+                    "dist": random.uniform(0, 1000),
+                    "mag": random.uniform(-2, 20),
+                    "absmag": random.uniform(-10, 20),
+                }
+                for index in range(size)
+            ]
+            results = [
+                "%6d, %8.3fs" % measure(population, stars, f"benchmark_{size}")
+                for population in (per_star_population, search_population)
+            ]
+            Search.clear(hash_=f"benchmark_{size}")
+            print(f"{size:>8} {results[0]:>18} {results[1]:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,5 +4,6 @@ if [ ! -f db.sqlite3 ]; then
     python3 -m flask db migrate
     python3 -m flask db upgrade
     python3 -m flask api download_stars
+    python3 -m flask api build_constellation_indexes
 fi
 exec "$@"
\ No newline at end of file
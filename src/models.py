@@ -1,10 +1,20 @@
+from typing import Any
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.types import UserDefinedType
 
 from starapp.constants import STELLAR_CLASSIFICATION
 
 db = SQLAlchemy()
 
 
+class Point(UserDefinedType):  # type: ignore
+    cache_ok = True
+
+    def get_col_spec(self, **kwargs: Any) -> str:
+        return "POINT"
+
+
 class Constellation(db.Model):  # type: ignore
     __tablename__ = "constellation"
     tag = db.Column(db.String(3), primary_key=True)
@@ -18,9 +28,19 @@ class Star(db.Model):  # type: ignore
     mag = db.Column(db.Float, nullable=False)
     absmag = db.Column(db.Float, nullable=False)
     spect = db.Column(db.Enum(*STELLAR_CLASSIFICATION, name="spect"), nullable=True)
+    name = db.Column(db.String(30), nullable=True)
     con = db.Column(db.String(3), db.ForeignKey("constellation.tag"), nullable=True)
     ra = db.Column(db.Float, nullable=False)
     dec = db.Column(db.Float, nullable=False)
+    position = db.deferred(
+        db.Column(Point, db.Computed("point(ra, dec)", persisted=True))
+    )
+    fingerprint = db.deferred(db.Column(db.BigInteger, nullable=True))
+
+    __table_args__ = (
+        db.Index("ix_star_position", position, postgresql_using="gist"),
+        db.Index("ix_star_con", con),
+    )
 
 
 class Catalog(db.Model):  # type: ignore
@@ -37,3 +57,9 @@ class CatalogAssociation(db.Model):  # type: ignore
     star_id = db.Column(db.Integer, db.ForeignKey("star.id"), primary_key=True)
     identifier = db.Column(db.String(30))
     star = db.relationship("Star")
+
+
+class Source(db.Model):  # type: ignore
+    __tablename__ = "source"
+    path = db.Column(db.String(255), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
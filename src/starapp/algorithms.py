@@ -1,11 +1,29 @@
+import hashlib
+import json
+import math
+import time
+import uuid
+from collections import OrderedDict
 from enum import Enum
+from functools import lru_cache
 from typing import Any, Optional, TypedDict, Union
 
+import numpy as np
+import numpy.typing as npt
 import redis
 
-from models import CatalogAssociation
-
-from .constants import CATALOGS, PAGINATION_SIZE, REDIS_SETTINGS, STR_CATALOGS
+from .constants import (
+    CONSTELLATION_HASH_PREFIX,
+    NAME,
+    PAGINATION_SIZE,
+    POLYGON_CACHE_SIZE,
+    POLYGON_HASH_PREFIX,
+    REDIS_CHUNK_SIZE,
+    REDIS_SETTINGS,
+    SEARCH_STORAGE,
+    SEARCH_TTL,
+    SESSION_STATE_PREFIX,
+)
 
 
 class TypeSearch(Enum):
@@ -14,29 +32,581 @@ class TypeSearch(Enum):
     ABSOLUTE_MAGNITUDE = "absmag"
 
 
-TypeRedisValue = TypedDict("TypeRedisValue", {"name": str, "value": float}, total=False)
+TypeRedisValue = TypedDict(
+    "TypeRedisValue", {"name": Optional[str], "value": float}, total=False
+)
+TypeFoundValue = tuple[Optional[TypeRedisValue], Optional[int]]
+
+
+SEGMENT_SCRIPT: str = """
+local first = redis.call(
+    "ZRANGEBYSCORE", KEYS[1], ARGV[1], "+inf", "WITHSCORES", "LIMIT", 0, 1
+)
+local last = redis.call(
+    "ZREVRANGEBYSCORE", KEYS[1], ARGV[2], "-inf", "WITHSCORES", "LIMIT", 0, 1
+)
+if tonumber(ARGV[3]) > 0 then
+    redis.call("EXPIRE", KEYS[1], ARGV[3])
+end
+return {first, last}
+"""
+
+PAGE_SCRIPT: str = """
+local members
+if ARGV[3] == "1" then
+    local length = redis.call("ZCARD", KEYS[1])
+    members = redis.call(
+        "ZREVRANGE", KEYS[1], length - 1 - ARGV[2], length - 1 - ARGV[1],
+        "WITHSCORES"
+    )
+else
+    members = redis.call("ZRANGE", KEYS[1], ARGV[1], ARGV[2], "WITHSCORES")
+end
+for index = 1, #members, 2 do
+    members[index] = string.sub(members[index], 23)
+end
+if tonumber(ARGV[4]) > 0 then
+    redis.call("EXPIRE", KEYS[1], ARGV[4])
+end
+return members
+"""
+
+FILTER_SCRIPT: str = """
+local number = redis.call("GET", KEYS[2])
+if number then
+    number = tonumber(number)
+    redis.call("EXPIRE", KEYS[1], ARGV[7])
+    redis.call("EXPIRE", KEYS[2], ARGV[7])
+else
+    local filters = {}
+    for i = 4, #KEYS do
+        local ids = {}
+        local members = redis.call(
+            "ZRANGEBYSCORE", KEYS[i], ARGV[2 * i], ARGV[2 * i + 1]
+        )
+        for _, member in ipairs(members) do
+            ids[string.sub(member, 12, 21)] = true
+        end
+        filters[#filters + 1] = ids
+    end
+    local members = redis.call(
+        "ZRANGEBYSCORE", KEYS[3], ARGV[1], ARGV[2], "WITHSCORES"
+    )
+    number = 0
+    redis.call("DEL", KEYS[1])
+    for index = 1, #members, 2 do
+        local id = string.sub(members[index], 12, 21)
+        local is_inside = true
+        for _, ids in ipairs(filters) do
+            if not ids[id] then
+                is_inside = false
+                break
+            end
+        end
+        if is_inside then
+            redis.call("ZADD", KEYS[1], members[index + 1], members[index])
+            number = number + 1
+        end
+    end
+    redis.call("EXPIRE", KEYS[1], ARGV[7])
+    redis.call("SET", KEYS[2], number, "EX", ARGV[7])
+end
+local first, last = tonumber(ARGV[3]), math.min(tonumber(ARGV[4]), number - 1)
+local page = {}
+if first <= last then
+    local members
+    if ARGV[5] == "1" then
+        members = redis.call("ZREVRANGE", KEYS[1], first, last, "WITHSCORES")
+    else
+        members = redis.call("ZRANGE", KEYS[1], first, last, "WITHSCORES")
+    end
+    for index = 1, #members, 2 do
+        page[#page + 1] = string.sub(members[index], 23)
+        page[#page + 1] = members[index + 1]
+    end
+end
+if tonumber(ARGV[6]) > 0 then
+    for i = 3, #KEYS do
+        redis.call("EXPIRE", KEYS[i], ARGV[6])
+    end
+end
+return {number, page}
+"""
+
+CACHE_GET_SCRIPT: str = """
+local statistics = redis.call("GET", KEYS[1])
+if not statistics then
+    return false
+end
+for index = 2, #KEYS - 2 do
+    if redis.call("EXPIRE", KEYS[index], ARGV[3]) == 0 then
+        return false
+    end
+end
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+redis.call("ZADD", KEYS[#KEYS - 1], ARGV[2] + ARGV[3], ARGV[4])
+redis.call("EXPIRE", KEYS[#KEYS - 1], ARGV[3])
+redis.call("ZADD", KEYS[#KEYS], ARGV[2], ARGV[1])
+return statistics
+"""
+
+CACHE_PUT_SCRIPT: str = """
+redis.call("SET", KEYS[1], ARGV[5], "EX", ARGV[3])
+redis.call("ZADD", KEYS[2], ARGV[2] + ARGV[3], ARGV[4])
+redis.call("EXPIRE", KEYS[2], ARGV[3])
+redis.call("ZADD", KEYS[3], ARGV[2], ARGV[1])
+local excess = redis.call("ZCARD", KEYS[3]) - tonumber(ARGV[6])
+local evicted = {}
+if excess <= 0 then
+    return evicted
+end
+for _, hash in ipairs(redis.call("ZRANGE", KEYS[3], 0, tonumber(ARGV[7]) - 1)) do
+    if excess <= 0 then
+        break
+    end
+    local references = hash .. ":references"
+    redis.call("ZREMRANGEBYSCORE", references, "-inf", ARGV[2])
+    if redis.call("EXISTS", hash .. ":statistics") == 0 then
+        -- Expired entry: its sets expire by themselves, and may already
+        -- be rebuilt by a worker that is about to put it again.
+        redis.call("ZREM", KEYS[3], hash)
+        excess = excess - 1
+    elseif redis.call("ZCARD", references) == 0 then
+        redis.call("DEL", hash .. ":statistics", references)
+        for index = 8, #ARGV do
+            redis.call("DEL", hash .. ":" .. ARGV[index])
+        end
+        redis.call("ZREM", KEYS[3], hash)
+        evicted[#evicted + 1] = hash
+        excess = excess - 1
+    end
+end
+return evicted
+"""
+
+
+@lru_cache(maxsize=None)
+def _redis_client(factory: Any) -> Any:
+    return factory(**REDIS_SETTINGS)
+
+
+@lru_cache(maxsize=None)
+def _registered_script(factory: Any, script: str) -> Any:
+    return _redis_client(factory).register_script(script)
+
+
+def get_redis() -> Any:
+    """Client shared by the worker, so handles built by every request reuse
+    one connection pool.
+    """
+    return _redis_client(redis.StrictRedis)
+
+
+def get_script(script: str) -> Any:
+    """Script of the shared client, registered once per worker."""
+    return _registered_script(redis.StrictRedis, script)
+
+
+def _member_of_star(index: int, star_id: int, name: Optional[str]) -> str:
+    """Stars without a display name are stored with an empty one."""
+    return f"{index:010d}:{star_id:010d}:{name or ''}"
+
+
+def _value_of_member(member: str, score: float) -> tuple[TypeRedisValue, int]:
+    value: TypeRedisValue = {"name": member[22:] or None, "value": float(score)}
+    return value, int(member[:10])
+
+
+def _cursor_of_position(descending: bool, index: int) -> str:
+    return ("d" if descending else "a") + str(index)
+
+
+def _position_of_cursor(cursor: str) -> tuple[bool, int]:
+    if cursor[:1] not in ("a", "d") or not cursor[1:].isdigit():
+        raise ValueError(cursor)
+    return cursor[0] == "d", int(cursor[1:])
 
 
 def get_value(
     redis_: Any, hash_: str, type_search: TypeSearch, index: int
 ) -> TypeRedisValue:
-    name_of_hash = redis_.lrange(hash_ + ":" + type_search.value, index, index)
-    to_dict = redis_.hgetall(name_of_hash[0])
+    member, score = redis_.zrange(
+        hash_ + ":" + type_search.value, index, index, withscores=True
+    )[0]
+    return _value_of_member(member, score)[0]
+
+
+class RedisStorage:
+    """Selection kept in a Redis sorted set, shared by all workers. Segments
+    and pages are read by Lua scripts called with EVALSHA.
+    """
+
+    redis_: Any
+    name: str
+    ttl: Optional[int]
+    segment_script: Any
+    page_script: Any
+    filter_script: Any
+
+    def __init__(
+        self,
+        name: str,
+        stars: Optional[list[tuple[int, Optional[str], float]]] = None,
+        is_shared: bool = False,
+        ttl: Optional[int] = None,
+    ):
+        self.redis_ = get_redis()
+        self.name = name
+        self.ttl = ttl
+        self.segment_script = get_script(SEGMENT_SCRIPT)
+        self.page_script = get_script(PAGE_SCRIPT)
+        self.filter_script = get_script(FILTER_SCRIPT)
+        if stars is None:
+            return
+
+        # Shared sets are built under a temporary key and renamed, so other
+        # workers never attach to a half-written set.
+        target: str = name + ":" + uuid.uuid4().hex if is_shared else name
+        pipeline = self.redis_.pipeline(transaction=False)
+        for start in range(0, len(stars), REDIS_CHUNK_SIZE):
+            pipeline.zadd(
+                target,
+                {
+                    _member_of_star(start + index, star_id, name_of_star): value
+                    for index, (star_id, name_of_star, value) in enumerate(
+                        stars[start : start + REDIS_CHUNK_SIZE]
+                    )
+                },
+            )
+        if is_shared:
+            if stars:
+                pipeline.rename(target, name)
+            else:
+                pipeline.delete(name)
+        if ttl is not None:
+            pipeline.expire(name, ttl)
+        pipeline.execute()
+
+    @classmethod
+    def attach(cls, name: str, ttl: Optional[int] = None) -> Optional["RedisStorage"]:
+        storage = cls(name, ttl=ttl)
+        if ttl is None:
+            exists = storage.redis_.exists(name)
+        else:
+            exists = storage.redis_.expire(name, ttl)
+        return storage if exists else None
+
+    @staticmethod
+    def delete_selection(names: list[str]) -> None:
+        get_redis().delete(*names)
+
+    @staticmethod
+    def delete_stale(prefix: str, keep: str) -> None:
+        """Delete the selections under "prefix" that are not under "keep"."""
+        redis_ = get_redis()
+        pipeline = redis_.pipeline(transaction=False)
+        for name in redis_.scan_iter(match=prefix + "*", count=REDIS_CHUNK_SIZE):
+            if not name.startswith(keep):
+                pipeline.delete(name)
+        pipeline.execute()
+
+    @staticmethod
+    def load_state(reference: str) -> dict[str, Any]:
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.get(SESSION_STATE_PREFIX + reference)
+        pipeline.expire(SESSION_STATE_PREFIX + reference, SEARCH_TTL)
+        state, _ = pipeline.execute()
+        result: dict[str, Any] = {} if state is None else json.loads(state)
+        return result
+
+    @staticmethod
+    def save_state(reference: str, state: dict[str, Any]) -> None:
+        if state:
+            get_redis().set(
+                SESSION_STATE_PREFIX + reference, json.dumps(state), ex=SEARCH_TTL
+            )
+        else:
+            get_redis().delete(SESSION_STATE_PREFIX + reference)
+
+    def __len__(self) -> int:
+        length: int = self.redis_.zcard(self.name)
+        return length
+
+    def delete(self) -> None:
+        self.redis_.delete(self.name)
+
+    def first_at_least(self, key: float) -> TypeFoundValue:
+        members = self.redis_.zrangebyscore(
+            self.name, key, "+inf", start=0, num=1, withscores=True
+        )
+        return _value_of_member(*members[0]) if members else (None, None)
+
+    def last_at_most(self, key: float) -> TypeFoundValue:
+        members = self.redis_.zrevrangebyscore(
+            self.name, key, "-inf", start=0, num=1, withscores=True
+        )
+        return _value_of_member(*members[0]) if members else (None, None)
+
+    def segment(
+        self, minimum: float, maximum: float
+    ) -> tuple[TypeFoundValue, TypeFoundValue]:
+        first_members, last_members = self.segment_script(
+            keys=[self.name], args=[repr(minimum), repr(maximum), self.ttl or 0]
+        )
+        return (
+            _value_of_member(*first_members) if first_members else (None, None),
+            _value_of_member(*last_members) if last_members else (None, None),
+        )
+
+    def page(
+        self, start_index: int, end_index: int, descending: bool = False
+    ) -> list[TypeRedisValue]:
+        members = self.page_script(
+            keys=[self.name],
+            args=[start_index, end_index, int(descending), self.ttl or 0],
+        )
+        return [
+            {"name": name or None, "value": float(score)}
+            for name, score in zip(members[::2], members[1::2])
+        ]
+
+    def filter(
+        self,
+        minimum: float,
+        maximum: float,
+        others: list[tuple[Any, float, float]],
+        start_index: int,
+        end_index: int,
+        descending: bool = False,
+    ) -> tuple[int, list[TypeRedisValue]]:
+        """Stars of the range that are also in the ranges of the other
+        storages of the selection, counted and paged in the order of this
+        one. The script intersects the ranges by star id once and keeps the
+        result for SEARCH_TTL under a key of the ranges, so further pages
+        are read from it.
+        """
+        others = sorted(others, key=lambda other: other[0].name)
+        bounds: list[str] = [repr(bound) for _, *range_ in others for bound in range_]
+        ranges: str = json.dumps(
+            [repr(minimum), repr(maximum), *[storage.name for storage, *_ in others]]
+            + bounds
+        )
+        result: str = self.name + ":filter:" + hashlib.sha1(ranges.encode()).hexdigest()
+        number, members = self.filter_script(
+            keys=[result, result + ":sum", self.name]
+            + [storage.name for storage, *_ in others],
+            args=[
+                repr(minimum),
+                repr(maximum),
+                start_index,
+                end_index,
+                int(descending),
+                self.ttl or 0,
+                SEARCH_TTL,
+                *bounds,
+            ],
+        )
+        return number, [
+            {"name": name or None, "value": float(score)}
+            for name, score in zip(members[::2], members[1::2])
+        ]
+
+
+class NumpyStorage:
+    """Selection kept in the worker as sorted arrays. Names are interned in
+    a table shared by all selections of the worker.
+    """
+
+    names: list[Optional[str]] = []
+    indexes_of_names: dict[Optional[str], int] = {}
+    states: "OrderedDict[str, tuple[dict[str, Any], float]]" = OrderedDict()
+
+    values: npt.NDArray[np.float64]
+    ids: npt.NDArray[np.int64]
+    name_indexes: npt.NDArray[np.intp]
+
+    def __init__(
+        self,
+        name: str,
+        stars: list[tuple[int, Optional[str], float]],
+        is_shared: bool = False,
+        ttl: Optional[int] = None,
+    ):
+        self.values = np.array([value for *_, value in stars], dtype=np.float64)
+        self.ids = np.array([star_id for star_id, *_ in stars], dtype=np.int64)
+        self.name_indexes = np.array(
+            [self._intern(name_of_star) for _, name_of_star, _ in stars],
+            dtype=np.intp,
+        )
+
+    @classmethod
+    def _intern(cls, name: Optional[str]) -> int:
+        index = cls.indexes_of_names.get(name)
+        if index is None:
+            index = cls.indexes_of_names[name] = len(cls.names)
+            cls.names.append(name)
+        return index
+
+    @classmethod
+    def attach(cls, name: str, ttl: Optional[int] = None) -> Optional["NumpyStorage"]:
+        return None
+
+    @staticmethod
+    def delete_selection(names: list[str]) -> None:
+        pass
+
+    @staticmethod
+    def delete_stale(prefix: str, keep: str) -> None:
+        pass
+
+    @classmethod
+    def _expire_states(cls, now: float) -> None:
+        while cls.states:
+            oldest, (_, last_used) = next(iter(cls.states.items()))
+            if now - last_used <= SEARCH_TTL:
+                break
+            del cls.states[oldest]
+
+    @classmethod
+    def load_state(cls, reference: str) -> dict[str, Any]:
+        now: float = time.monotonic()
+        cls._expire_states(now)
+        if reference not in cls.states:
+            return {}
+        state: dict[str, Any] = cls.states[reference][0]
+        cls.states[reference] = (state, now)
+        cls.states.move_to_end(reference)
+        return dict(state)
+
+    @classmethod
+    def save_state(cls, reference: str, state: dict[str, Any]) -> None:
+        now: float = time.monotonic()
+        cls._expire_states(now)
+        cls.states.pop(reference, None)
+        if state:
+            cls.states[reference] = (dict(state), now)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def delete(self) -> None:
+        pass
+
+    def _value(self, index: int) -> TypeFoundValue:
+        value: TypeRedisValue = {
+            "name": self.names[self.name_indexes[index]],
+            "value": float(self.values[index]),
+        }
+        return value, index
+
+    def first_at_least(self, key: float) -> TypeFoundValue:
+        index = int(np.searchsorted(self.values, key, side="left"))
+        return self._value(index) if index < len(self.values) else (None, None)
+
+    def last_at_most(self, key: float) -> TypeFoundValue:
+        index = int(np.searchsorted(self.values, key, side="right")) - 1
+        return self._value(index) if index >= 0 else (None, None)
+
+    def segment(
+        self, minimum: float, maximum: float
+    ) -> tuple[TypeFoundValue, TypeFoundValue]:
+        return self.first_at_least(minimum), self.last_at_most(maximum)
+
+    def page(
+        self, start_index: int, end_index: int, descending: bool = False
+    ) -> list[TypeRedisValue]:
+        result: list[TypeRedisValue] = [
+            {"name": self.names[name_index], "value": float(value)}
+            for name_index, value in zip(
+                self.name_indexes[start_index : end_index + 1],
+                self.values[start_index : end_index + 1],
+            )
+        ]
+        return result[::-1] if descending else result
+
+    def _range(self, minimum: float, maximum: float) -> slice:
+        return slice(
+            int(np.searchsorted(self.values, minimum, side="left")),
+            int(np.searchsorted(self.values, maximum, side="right")),
+        )
+
+    def filter(
+        self,
+        minimum: float,
+        maximum: float,
+        others: list[tuple[Any, float, float]],
+        start_index: int,
+        end_index: int,
+        descending: bool = False,
+    ) -> tuple[int, list[TypeRedisValue]]:
+        range_ = self._range(minimum, maximum)
+        indexes = np.arange(len(self.values))[range_]
+        for storage, other_minimum, other_maximum in others:
+            other_ids = storage.ids[storage._range(other_minimum, other_maximum)]
+            indexes = indexes[np.isin(self.ids[indexes], other_ids)]
+
+        if descending:
+            indexes = indexes[::-1]
+        result: list[TypeRedisValue] = [
+            {
+                "name": self.names[self.name_indexes[index]],
+                "value": float(self.values[index]),
+            }
+            for index in indexes[start_index : end_index + 1]
+        ]
+        return len(indexes), result
+
+
+STORAGES: dict[str, Union[type[RedisStorage], type[NumpyStorage]]] = {
+    "redis": RedisStorage,
+    "numpy": NumpyStorage,
+}
+
+
+def load_session_state(reference: str) -> dict[str, Any]:
+    """State of the session that does not fit in its cookie, such as the
+    hashes of a batch and the last segment searches. It is kept with the
+    selections, under the reference of the session, for SEARCH_TTL.
+    """
+    return STORAGES[SEARCH_STORAGE].load_state(reference)
 
-    value: TypeRedisValue = {"name": to_dict["name"], "value": float(to_dict["value"])}
-    return value
+
+def save_session_state(reference: str, state: dict[str, Any]) -> None:
+    STORAGES[SEARCH_STORAGE].save_state(reference, state)
+
+
+SHARED_HASH_PREFIXES: tuple[str, ...] = (
+    CONSTELLATION_HASH_PREFIX,
+    POLYGON_HASH_PREFIX,
+)
 
 
 class MetaSearch(type):
-    _instances: dict[str, object] = {}
+    """Keeps handles, least recently used first, until they have not been
+    used for SEARCH_TTL, like selections in Redis.
+    """
+
+    _instances: "OrderedDict[str, tuple[object, float]]" = OrderedDict()
 
     def __call__(self, hash_: str, type_search: TypeSearch, *args: Any, **kwargs: Any):  # type: ignore
         key: str = hash_ + ":" + type_search.value
-        if key not in self._instances:
-            self._instances[key] = super(MetaSearch, self).__call__(
-                hash_, type_search, *args, **kwargs
-            )
-        return self._instances[key]
+        now: float = time.monotonic()
+        while self._instances:
+            oldest, (_, last_used) = next(iter(self._instances.items()))
+            if now - last_used <= SEARCH_TTL:
+                break
+            del self._instances[oldest]
+
+        if key in self._instances:
+            instance = self._instances[key][0]
+            self._instances[key] = (instance, now)
+            self._instances.move_to_end(key)
+            return instance
+
+        instance = super(MetaSearch, self).__call__(hash_, type_search, *args, **kwargs)
+        if getattr(instance, "is_cached", True):
+            self._instances[key] = (instance, now)
+        return instance
 
     def clear(self, hash_: str) -> None:
         for type_search in TypeSearch:
@@ -47,194 +617,260 @@ class MetaSearch(type):
 
 
 class Search(metaclass=MetaSearch):
-    redis_: Any
+    """Handle of a selection. Selections in Redis live only in Redis, with a
+    sliding TTL, so any worker can rebuild the handle from the hash; only
+    handles of in-process storages are kept by MetaSearch. Shared selections
+    are attached when they exist, unless "rebuild" replaces them.
+    """
+
+    storage: Union[RedisStorage, NumpyStorage]
     hash_: str
     type_search: TypeSearch
     length: int
     last_search: dict[str, int]
+    is_shared: bool
+    is_cached: bool
 
     def __init__(
         self,
         hash_: str,
         type_search: TypeSearch,
         stars: Optional[list[dict[str, Any]]] = None,
+        rebuild: bool = False,
     ):
-        if stars is None:
-            return
-
-        self.redis_ = redis.StrictRedis(**REDIS_SETTINGS)
+        self.is_shared = hash_.startswith(SHARED_HASH_PREFIXES)
         self.hash_ = hash_
         self.type_search = type_search
-        self.length = len(stars)
-
-        sorted_stars = sorted(stars, key=lambda star: star[type_search.value])  # type: ignore
-        for star in sorted_stars:
-            name_of_star = self.return_name_of_star(star["id"])
-            name_of_hash = hash_ + ":" + self.type_search.value + ":" + name_of_star
-            self.redis_.hset(
-                name_of_hash,
-                mapping={
-                    "name": name_of_star,
-                    "value": star[self.type_search.value],
-                },
+        self.last_search = {}
+        name: str = hash_ + ":" + type_search.value
+        ttl: Optional[int] = (
+            None if hash_.startswith(CONSTELLATION_HASH_PREFIX) else SEARCH_TTL
+        )
+        storage_class = STORAGES[SEARCH_STORAGE]
+        storage = (
+            storage_class.attach(name, ttl)
+            if stars is None or (self.is_shared and not rebuild)
+            else None
+        )
+        if storage is None:
+            if stars is None:
+                raise KeyError(name)
+
+            sorted_stars = sorted(stars, key=lambda star: star[type_search.value])  # type: ignore
+            storage = storage_class(
+                name,
+                [
+                    (star["id"], star[NAME], star[type_search.value])
+                    for star in sorted_stars
+                ],
+                is_shared=self.is_shared,
+                ttl=ttl,
             )
-            self.redis_.rpush(hash_ + ":" + type_search.value, name_of_hash)
+            self.length = len(stars)
+        else:
+            self.length = len(storage)
 
-    def __del__(self) -> None:
-        name_of_hash: str = self.hash_ + ":" + self.type_search.value
-        for record in self.redis_.lrange(name_of_hash, 0, self.length):
-            self.redis_.delete(record)
-        self.redis_.delete(name_of_hash)
+        self.storage = storage
+        self.is_cached = isinstance(storage, NumpyStorage)
+
+    @classmethod
+    def clear(cls, hash_: str) -> None:
+        MetaSearch.clear(cls, hash_)
+        if not hash_.startswith(SHARED_HASH_PREFIXES):
+            STORAGES[SEARCH_STORAGE].delete_selection(
+                [hash_ + ":" + type_search.value for type_search in TypeSearch]
+            )
 
     def segment_search(
         self, minimum: float, maximum: float
     ) -> dict[str, Union[TypeRedisValue, int, str]]:
-        min_value: Optional[TypeRedisValue]
-        min_index: Optional[int]
-        max_value: Optional[TypeRedisValue]
-        max_index: Optional[int]
-        min_value, min_index = self.binary_search(minimum, is_minimum=True)
-        max_value, max_index = self.binary_search(maximum, is_minimum=False)
-
-        is_one_of_values_none: bool = (min_value is None) or (max_value is None)
-        is_one_of_indexes_none: bool = (min_index is None) or (max_index is None)
+        (min_value, min_index), (max_value, max_index) = self.storage.segment(
+            minimum, maximum
+        )
 
         if (
-            is_one_of_values_none
-            or is_one_of_indexes_none
-            or (min_value["value"] > max_value["value"])  # type: ignore
+            min_value is None
+            or max_value is None
+            or min_index is None
+            or max_index is None
+            or min_value["value"] > max_value["value"]
         ):
             self.last_search = {}
             return {"minimum": "-", "maximum": "-", "sum": "-"}
 
         self.last_search = {
-            "min_index": min_index,  # type: ignore
-            "max_index": max_index,  # type: ignore
+            "min_index": min_index,
+            "max_index": max_index,
         }
 
         return {
-            "minimum": min_value,  # type: ignore
-            "maximum": max_value,  # type: ignore
-            "sum": max_index - min_index + 1,  # type: ignore
+            "minimum": min_value,
+            "maximum": max_value,
+            "sum": max_index - min_index + 1,
         }
 
-    def binary_search(
-        self, key: float, is_minimum: bool
-    ) -> tuple[Optional[TypeRedisValue], Optional[int]]:
-        left: int = 0
-        right: int = self.length - 1
-        while left < right:
-            mid: int = (left + right) // 2
-            first_value = get_value(self.redis_, self.hash_, self.type_search, mid)
-            second_value = get_value(self.redis_, self.hash_, self.type_search, mid + 1)
-
-            if first_value["value"] <= key <= second_value["value"]:
-                if is_minimum:
-                    if first_value["value"] == second_value["value"]:
-                        while first_value["value"] == key and mid > 0:
-                            mid -= 1
-                            first_value = get_value(
-                                self.redis_, self.hash_, self.type_search, mid
-                            )
-                            second_value = get_value(
-                                self.redis_, self.hash_, self.type_search, mid + 1
-                            )
-
-                        if mid == 0 and first_value["value"] == key:
-                            result_value = first_value
-                            result_index = mid
-                        else:
-                            result_value = second_value
-                            result_index = mid + 1
-                    else:
-                        result_value = second_value
-                        result_index = mid + 1
-                else:
-                    if first_value["value"] == second_value["value"]:
-                        while (
-                            second_value["value"] == key and mid + 1 < self.length - 1
-                        ):
-                            mid += 1
-                            first_value = get_value(
-                                self.redis_, self.hash_, self.type_search, mid
-                            )
-                            second_value = get_value(
-                                self.redis_, self.hash_, self.type_search, mid + 1
-                            )
-
-                        if mid + 1 == self.length - 1 and second_value["value"] == key:
-                            result_value = second_value
-                            result_index = mid + 1
-                        else:
-                            result_value = first_value
-                            result_index = mid
-                    else:
-                        result_value = first_value
-                        result_index = mid
-
-                return result_value, result_index
-
-            elif first_value["value"] < key:
-                left = mid + 1
-            elif first_value["value"] > key:
-                right = mid
-
+    def filter_search(
+        self,
+        ranges: dict[TypeSearch, tuple[float, float]],
+        page: int,
+        descending: bool = False,
+    ) -> dict[str, Union[int, list[TypeRedisValue]]]:
+        minimum, maximum = ranges.get(self.type_search, (-math.inf, math.inf))
+        others: list[tuple[Any, float, float]] = [
+            (Search(self.hash_, type_search).storage, *range_)
+            for type_search, range_ in ranges.items()
+            if type_search != self.type_search
+        ]
+        start_index: int = (page - 1) * PAGINATION_SIZE
+        number, stars = self.storage.filter(
+            minimum,
+            maximum,
+            others,
+            start_index,
+            start_index + PAGINATION_SIZE - 1,
+            descending,
+        )
+        return {"sum": number, "stars": stars}
+
+    def binary_search(self, key: float, is_minimum: bool) -> TypeFoundValue:
         if is_minimum:
-            if first_value["value"] >= key:
-                return first_value, mid
-        else:
-            if second_value["value"] <= key:
-                return second_value, mid + 1
-        return None, None
+            return self.storage.first_at_least(key)
+        return self.storage.last_at_most(key)
 
-    def sort_search(self, page: int, descending: bool = False) -> list[TypeRedisValue]:
+    def sort_search(
+        self, page: int, descending: bool = False, size: int = PAGINATION_SIZE
+    ) -> list[TypeRedisValue]:
         try:
             min_index: int = self.last_search["min_index"]
             max_index: int = self.last_search["max_index"]
         except KeyError:
             return []
 
-        result: list[TypeRedisValue] = []
-        incr: int
         start_index: int
         end_index: int
         if descending:
-            start_index = max_index - (page - 1) * PAGINATION_SIZE
-            pagination_min = max_index - PAGINATION_SIZE * page + 1
-            end_index = (
-                pagination_min if pagination_min > min_index else min_index
-            ) - 1
-            incr = -1
-            if start_index < min_index:
-                return result
+            end_index = max_index - (page - 1) * size
+            start_index = max(max_index - size * page + 1, min_index)
         else:
-            start_index = min_index + (page - 1) * PAGINATION_SIZE
-            pagination_max = min_index + PAGINATION_SIZE * page - 1
-            end_index = (
-                pagination_max if pagination_max < max_index else max_index
-            ) + 1
-            incr = 1
-            if start_index > max_index:
-                return result
-
-        for index in range(start_index, end_index, incr):
-            value = get_value(self.redis_, self.hash_, self.type_search, index)
-            result.append(value)
+            start_index = min_index + (page - 1) * size
+            end_index = min(min_index + size * page - 1, max_index)
 
+        if start_index > end_index:
+            return []
+
+        return self.storage.page(start_index, end_index, descending)
+
+    def cursor_search(
+        self,
+        cursor: Optional[str] = None,
+        descending: bool = False,
+        size: int = PAGINATION_SIZE,
+    ) -> dict[str, Union[Optional[str], list[TypeRedisValue]]]:
+        """Page of the last segment starting at "cursor", which also holds
+        the direction, or at the end chosen by "descending" without it.
+        Ranks of a selection never change, so the rank is the keyset.
+        """
+        try:
+            min_index: int = self.last_search["min_index"]
+            max_index: int = self.last_search["max_index"]
+        except KeyError:
+            return {"stars": [], "cursor": None}
+
+        index: int = max_index if descending else min_index
+        if cursor is not None:
+            descending, index = _position_of_cursor(cursor)
+
+        start_index: int
+        end_index: int
+        next_index: int
+        if descending:
+            end_index = min(index, max_index)
+            start_index = max(end_index - size + 1, min_index)
+            next_index = start_index - 1
+        else:
+            start_index = max(index, min_index)
+            end_index = min(start_index + size - 1, max_index)
+            next_index = end_index + 1
+
+        if start_index > end_index:
+            return {"stars": [], "cursor": None}
+
+        return {
+            "stars": self.storage.page(start_index, end_index, descending),
+            "cursor": (
+                _cursor_of_position(descending, next_index)
+                if min_index <= next_index <= max_index
+                else None
+            ),
+        }
+
+
+class PolygonCache:
+    """Statistics and Search sets of polygon selections, shared by all
+    workers under the polygon hash. Every session holding an entry keeps a
+    reference in "<hash>:references" that expires after SEARCH_TTL, so
+    abandoned sessions do not pin entries. Once there are more than "size"
+    entries, the least recently used ones without live references are
+    evicted, looking at no more than SCAN_LIMIT of them per put.
+    """
+
+    RECENT: str = "polygon_cache:recent"
+    SCAN_LIMIT: int = 100
+
+    redis_: Any
+    size: int
+    get_script: Any
+    put_script: Any
+
+    def __init__(self, size: int = POLYGON_CACHE_SIZE):
+        self.redis_ = get_redis()
+        self.size = size
+        self.get_script = get_script(CACHE_GET_SCRIPT)
+        self.put_script = get_script(CACHE_PUT_SCRIPT)
+
+    def get(self, hash_: str, reference: str) -> Optional[dict[str, Any]]:
+        """Statistics of the entry, refreshed and referenced by "reference",
+        or None when the entry or one of its sets has expired.
+        """
+        statistics = self.get_script(
+            keys=[
+                hash_ + ":statistics",
+                *[hash_ + ":" + type_search.value for type_search in TypeSearch],
+                hash_ + ":references",
+                self.RECENT,
+            ],
+            args=[hash_, time.time(), SEARCH_TTL, reference],
+        )
+        if statistics is None:
+            return None
+        result: dict[str, Any] = json.loads(statistics)
         return result
 
-    @staticmethod
-    def return_name_of_star(star_id: int) -> str:
-        for tag in CATALOGS:
-            catalog_association = CatalogAssociation.query.filter_by(
-                star_id=star_id,
-                catalog_tag=tag,
-            ).first()
-            if catalog_association is not None:
-                identifier: str = catalog_association.identifier
-                return (
-                    identifier
-                    if tag in STR_CATALOGS
-                    else tag.upper() + " " + identifier
-                )
-        raise ValueError()
+    def put(self, hash_: str, statistics: dict[str, Any], reference: str) -> None:
+        evicted = self.put_script(
+            keys=[hash_ + ":statistics", hash_ + ":references", self.RECENT],
+            args=[
+                hash_,
+                time.time(),
+                SEARCH_TTL,
+                reference,
+                json.dumps(statistics),
+                self.size,
+                self.SCAN_LIMIT,
+                *[type_search.value for type_search in TypeSearch],
+            ],
+        )
+        for evicted_hash in evicted:
+            Search.clear(hash_=evicted_hash)
+
+    def release(self, hash_: str, reference: str) -> None:
+        self.redis_.zrem(hash_ + ":references", reference)
+
+
+def get_polygon_cache() -> Optional[PolygonCache]:
+    """The cache shares the Search sets of polygons, so it is only used
+    when they are kept in Redis.
+    """
+    if STORAGES[SEARCH_STORAGE] is not RedisStorage:
+        return None
+    return PolygonCache()
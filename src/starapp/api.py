@@ -1,88 +1,172 @@
-from functools import partial
-from multiprocessing import Manager, Pool, cpu_count
-from typing import Any, Union
+import hashlib
+import io
+import os
+import time
+from collections.abc import Iterator
+from typing import Any, Optional
 
 import click
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from flask import Blueprint
-from sqlalchemy import text
 
-from models import Catalog, CatalogAssociation, Constellation, Star, db
+from models import Catalog, CatalogAssociation, Constellation, Source, Star, db
 
+from .algorithms import STORAGES
 from .constants import (
     CATALOGS,
     CONSTELLATION,
+    CONSTELLATION_HASH_PREFIX,
     DEC,
+    INGEST_CHUNK_SIZE,
+    INPUT_COLUMNS,
     INT_CATALOGS,
     LIST_OF_CONSTELLATIONS,
+    NAME,
     OTHER_DATA,
     PATH_TO_HYGDATA_V3,
     RA,
+    SEARCH_STORAGE,
     SPECT,
     STELLAR_CLASSIFICATION,
     STR_CATALOGS,
 )
+from .views import create_constellation_search, get_constellation_hash_prefix
 
 bp_cli = Blueprint("api", __name__)
 
 
-def create_views_for_constellation(constellations: list[Constellation]) -> None:
-    for constellation in constellations:
-        constellation_view = text(
-            f"""
-            CREATE VIEW stars_with_{constellation.tag} AS
-                SELECT * FROM star WHERE con='{constellation.tag}';
-        """
-        )
-        db.session.execute(constellation_view)
-        db.session.commit()
-
-
-def get_spect(spect_from_line: str) -> Union[str, None]:
-    spect = None
-    try:
-        classification = spect_from_line[0]
-        if classification in STELLAR_CLASSIFICATION:
-            spect = classification
-        else:
-            spect = None
-    except:
-        spect = None
-
-    return spect
-
-
-def add_star(
-    stars: list[Star],
-    catalog_associations: list[CatalogAssociation],
-    line: dict[str, Any],
-) -> None:
-    constellation = line[CONSTELLATION]
-
-    star = Star(
-        id=int(line["id"]),
-        **{key: line[key] for key in OTHER_DATA},
-        spect=get_spect(line[SPECT]),
-        ra=line[RA],
-        dec=line[DEC],
-        con=constellation.lower() if constellation is not None else None,
-    )
+def get_spect(spects: pd.Series) -> pd.Series:
+    classifications = spects.astype("string").str[0]
+    return classifications.where(classifications.isin(STELLAR_CLASSIFICATION))
+
 
-    stars.append(star)
+def get_identifiers(data: pd.DataFrame, tag: str) -> pd.Series:
+    identifiers = data[tag].dropna()
+    if tag in INT_CATALOGS:
+        return identifiers.astype(np.int64).astype(str)
+    return identifiers.astype(str)
+
+
+def get_name(data: pd.DataFrame) -> pd.Series:
+    names = pd.Series(np.nan, index=data.index, dtype=object)
+    for tag in CATALOGS:
+        identifiers = get_identifiers(data, tag)
+        if tag in INT_CATALOGS:
+            identifiers = tag.upper() + " " + identifiers
+        names = names.fillna(identifiers)
 
-    for catalog_type, func in zip((INT_CATALOGS, STR_CATALOGS), (int, str)):
-        for catalog in catalog_type:
-            if line[catalog] is not None:
-                catalog_association = CatalogAssociation(
-                    star_id=star.id, catalog_tag=catalog, identifier=func(line[catalog])
+    return names
+
+
+def read_chunks(path: str) -> Iterator[pd.DataFrame]:
+    """Chunks of at most INGEST_CHUNK_SIZE rows with only INPUT_COLUMNS.
+    CSV, Parquet and Arrow IPC (file or stream) catalogs are read batch by
+    batch, so memory does not grow with the size of the catalog.
+    """
+    columns: list[str] = list(INPUT_COLUMNS)
+    extension: str = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        for batch in pq.ParquetFile(path).iter_batches(
+            batch_size=INGEST_CHUNK_SIZE, columns=columns
+        ):
+            yield batch.to_pandas()
+    elif extension in (".arrow", ".arrows", ".feather", ".ipc"):
+        with pa.memory_map(path) as source:
+            if extension == ".arrows":
+                batches = iter(pa.ipc.open_stream(source))
+            else:
+                reader = pa.ipc.open_file(source)
+                batches = (
+                    reader.get_batch(index)
+                    for index in range(reader.num_record_batches)
                 )
-                catalog_associations.append(catalog_association)
+            for batch in batches:
+                table = pa.Table.from_batches([batch]).select(columns)
+                for offset in range(0, table.num_rows, INGEST_CHUNK_SIZE):
+                    yield table.slice(offset, INGEST_CHUNK_SIZE).to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=INGEST_CHUNK_SIZE)
+
+
+def get_stars(data: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "id": data["id"],
+            **{key: data[key] for key in OTHER_DATA},
+            SPECT: get_spect(data[SPECT]),
+            NAME: get_name(data),
+            RA: data[RA],
+            DEC: data[DEC],
+            CONSTELLATION: data[CONSTELLATION].astype("string").str.lower(),
+        }
+    )
+
+
+def get_catalog_associations(data: pd.DataFrame) -> pd.DataFrame:
+    catalog_associations = data.melt(
+        id_vars=["id"],
+        value_vars=list(INT_CATALOGS + STR_CATALOGS),
+        var_name="catalog_tag",
+        value_name="identifier",
+    ).dropna(subset=["identifier"])
+    is_int = catalog_associations["catalog_tag"].isin(INT_CATALOGS)
+    catalog_associations.loc[is_int, "identifier"] = (
+        catalog_associations.loc[is_int, "identifier"].astype(np.int64).astype(str)
+    )
+    return catalog_associations.rename(columns={"id": "star_id"})
+
+
+def get_fingerprints(data: pd.DataFrame, stars: pd.DataFrame) -> pd.Series:
+    """Hash of every star row together with its catalog identifiers. The
+    columns are cast to fixed dtypes first, because hashes depend on the
+    dtypes, which are inferred chunk by chunk.
+    """
+    frame = stars.assign(**{tag: get_identifiers(data, tag) for tag in CATALOGS})
+    numbers: list[str] = [*OTHER_DATA, RA, DEC]
+    strings: list[str] = [
+        column for column in frame.columns if column not in numbers + ["id"]
+    ]
+    frame = pd.concat(
+        [
+            frame["id"].astype(np.int64),
+            frame[numbers].astype(np.float64),
+            frame[strings].astype("string").fillna("").astype(object),
+        ],
+        axis=1,
+    )
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return pd.Series(hashes.view(np.int64), index=stars.index)
+
+
+def get_file_fingerprint(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def copy_frame(cursor: Any, table: str, frame: pd.DataFrame) -> None:
+    """Load a frame with COPY FROM STDIN. Missing values are written as
+    unquoted empty fields, which COPY reads as NULL.
+    """
+    buffer = io.StringIO()
+    frame.to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({','.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
 
 
 def create_catalogs() -> None:
     click.echo(f"\nStart downloading catalogs")
     for tag in CATALOGS:
+        if Catalog.query.get(tag) is not None:
+            continue
         catalog_model_instance = Catalog(tag=tag)
         click.echo(f'Added catalog with tag: "{tag}"')
         db.session.add(catalog_model_instance)
@@ -93,49 +177,170 @@ def create_catalogs() -> None:
 
 def create_constellations() -> None:
     click.echo(f"\nStart downloading constellations ({len(LIST_OF_CONSTELLATIONS)})")
-    constellations = [Constellation(tag=tag) for tag in LIST_OF_CONSTELLATIONS]
+    existing_tags = {constellation.tag for constellation in Constellation.query.all()}
+    constellations = [
+        Constellation(tag=tag)
+        for tag in LIST_OF_CONSTELLATIONS
+        if tag not in existing_tags
+    ]
     db.session.bulk_save_objects(constellations)
     click.echo("Saving constellations in the database...")
     db.session.commit()
-    click.echo("Creating views for constellations")
-    create_views_for_constellation(constellations)
     click.echo("Constellations have successfully saved in the database")
 
 
-def get_api() -> None:
-    hygdata = pd.read_csv(PATH_TO_HYGDATA_V3)
-    data = hygdata.replace(np.nan, None)
+def load_stars(cursor: Any, path: str) -> None:
+    number_of_stars: int = 0
+    number_of_rows: int = 0
+    start: float = time.perf_counter()
+    for chunk in read_chunks(path):
+        stars = get_stars(chunk)
+        stars["fingerprint"] = get_fingerprints(chunk, stars)
+        catalog_associations = get_catalog_associations(chunk)
+        copy_frame(cursor, Star.__tablename__, stars)
+        copy_frame(cursor, CatalogAssociation.__tablename__, catalog_associations)
+
+        number_of_stars += len(stars)
+        number_of_rows += len(stars) + len(catalog_associations)
+        click.echo(
+            f"Saved {number_of_stars} stars "
+            f"({number_of_rows / (time.perf_counter() - start):.0f} rows/s)"
+        )
+
+
+def update_stars(cursor: Any, path: str) -> None:
+    """Upsert the stars whose fingerprint changed, replace their catalog
+    associations and delete the stars that are not in the file any more.
+    Ids and fingerprints of every chunk are copied to temporary tables and
+    compared with the star table in SQL, so memory does not grow with the
+    size of the catalog. Unchanged rows are only hashed, never written.
+    """
+    cursor.execute(
+        """
+            CREATE TEMP TABLE star_changes (LIKE star) ON COMMIT DROP;
+            CREATE TEMP TABLE catalog_association_changes
+                (LIKE catalog_association) ON COMMIT DROP;
+            CREATE TEMP TABLE chunk_fingerprints
+                (id integer PRIMARY KEY, fingerprint bigint) ON COMMIT DROP;
+            CREATE TEMP TABLE source_ids (id integer PRIMARY KEY) ON COMMIT DROP;
+        """
+    )
+
+    columns: list[str] = [
+        "id",
+        *OTHER_DATA,
+        SPECT,
+        NAME,
+        RA,
+        DEC,
+        CONSTELLATION,
+        "fingerprint",
+    ]
+    number_of_changes: int = 0
+    for chunk in read_chunks(path):
+        stars = get_stars(chunk)
+        stars["fingerprint"] = get_fingerprints(chunk, stars)
+        cursor.execute("TRUNCATE chunk_fingerprints;")
+        copy_frame(cursor, "chunk_fingerprints", stars[["id", "fingerprint"]])
+        cursor.execute("INSERT INTO source_ids SELECT id FROM chunk_fingerprints;")
+        cursor.execute(
+            """
+                SELECT chunk_fingerprints.id FROM chunk_fingerprints
+                LEFT JOIN star ON star.id = chunk_fingerprints.id
+                WHERE star.fingerprint IS DISTINCT FROM chunk_fingerprints.fingerprint;
+            """
+        )
+        changed_ids: list[int] = [star_id for (star_id,) in cursor.fetchall()]
+
+        changes = stars[stars["id"].isin(changed_ids)]
+        catalog_associations = get_catalog_associations(chunk)
+        copy_frame(cursor, "star_changes", changes)
+        copy_frame(
+            cursor,
+            "catalog_association_changes",
+            catalog_associations[catalog_associations["star_id"].isin(changed_ids)],
+        )
+        number_of_changes += len(changes)
+
+    updates: str = ",".join(f"{column}=EXCLUDED.{column}" for column in columns)
+    cursor.execute(
+        f"""
+            INSERT INTO star ({",".join(columns)})
+                SELECT {",".join(columns)} FROM star_changes
+                ON CONFLICT (id) DO UPDATE SET {updates};
+            DELETE FROM catalog_association
+                WHERE star_id IN (SELECT id FROM star_changes);
+            INSERT INTO catalog_association
+                SELECT * FROM catalog_association_changes;
+            DELETE FROM catalog_association WHERE NOT EXISTS (
+                SELECT 1 FROM source_ids WHERE source_ids.id = star_id
+            );
+        """
+    )
+    cursor.execute(
+        """
+            DELETE FROM star WHERE NOT EXISTS (
+                SELECT 1 FROM source_ids WHERE source_ids.id = star.id
+            );
+        """
+    )
+    click.echo(f"Updated {number_of_changes} stars, deleted {cursor.rowcount} stars")
+
+
+def get_api(incremental: bool = False, path: Optional[str] = None) -> None:
+    path = PATH_TO_HYGDATA_V3 if path is None else path
+    fingerprint: str = get_file_fingerprint(path)
+    source = Source.query.get(path)
+    if incremental and source is not None and source.fingerprint == fingerprint:
+        click.echo("The file has not changed since the last download")
+        return
+
     create_constellations()
     create_catalogs()
 
-    click.echo(f"\nStart downloading stars ({len(data)})")
-
-    with click.progressbar(
-        range(len(data)), label="Download stars:"
-    ) as stars_bar, Manager() as manager:
-        stars: list[Star] = manager.list()
-        catalog_associations: list[CatalogAssociation] = manager.list()
+    click.echo(f"\nStart downloading stars (chunks of {INGEST_CHUNK_SIZE})")
+    cursor = db.session.connection().connection.cursor()
+    if incremental:
+        update_stars(cursor, path)
+    else:
+        load_stars(cursor, path)
+    cursor.close()
 
-        with Pool(cpu_count() - 1) as pool:
-            pool.map(
-                partial(add_star, stars, catalog_associations),
-                [data.loc[index] for index in stars_bar],
-            )
+    db.session.merge(Source(path=path, fingerprint=fingerprint))
+    db.session.commit()
+    STORAGES[SEARCH_STORAGE].delete_stale(
+        CONSTELLATION_HASH_PREFIX, keep=get_constellation_hash_prefix()
+    )
+    click.echo("Stars have successfully saved in the database")
 
-        click.echo("\nSaving stars in the database...")
 
-        db.session.bulk_save_objects(stars)
-        db.session.bulk_save_objects(catalog_associations)
+def create_constellation_indexes() -> None:
+    with click.progressbar(
+        LIST_OF_CONSTELLATIONS, label="Build constellation indexes:"
+    ) as constellations_bar:
+        for tag in constellations_bar:
+            create_constellation_search(tag, rebuild=True)
 
-        db.session.commit()
 
-        click.echo("Stars have successfully saved in the database")
+@bp_cli.cli.command("build_constellation_indexes")  # type: ignore
+def build_constellation_indexes() -> None:
+    click.echo("Start building sorted indexes for constellations")
+    create_constellation_indexes()
+    click.echo("Indexes for constellations have successfully built!")
 
 
 @bp_cli.cli.command("download_stars")  # type: ignore
-def download_stars() -> None:
-    click.echo(
-        f'Start downloading information about stars from file "{PATH_TO_HYGDATA_V3}"'
-    )
-    get_api()
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Update only the stars that changed since the last download.",
+)
+@click.option(
+    "--path",
+    default=PATH_TO_HYGDATA_V3,
+    help="CSV, Parquet (.parquet) or Arrow IPC (.arrow, .arrows) catalog.",
+)
+def download_stars(incremental: bool, path: str) -> None:
+    click.echo(f'Start downloading information about stars from file "{path}"')
+    get_api(incremental, path)
     click.echo("Information about stars have successfully downloaded!")
@@ -34,6 +34,7 @@ CATALOGS: tuple[str, ...] = STR_CATALOGS + INT_CATALOGS
 RA: str = "ra"
 DEC: str = "dec"
 SPECT: str = "spect"
+NAME: str = "name"
 CONSTELLATION: str = "con"
 
 OTHER_DATA: tuple[str, ...] = (
@@ -134,12 +135,23 @@ LIST_OF_CONSTELLATIONS: tuple[str, ...] = (
 )
 
 PATH_TO_HYGDATA_V3: str = "data/hygdata_v3.csv"
+INPUT_COLUMNS: tuple[str, ...] = (
+    ("id",) + CATALOGS + OTHER_DATA + (RA, DEC, SPECT, CONSTELLATION)
+)
 
 ERROR_IS_POINTS_RANGE_VALID: str = (
     "'Dec' must be from -90 to 90, 'Ra' must be from -24 to 24!"
 )
+ERROR_IS_POINTS_RANGE_VALID_ON_SPHERE: str = (
+    "'Dec' must be from -90 to 90, 'Ra' must be from -24 to 24"
+    " and points must lie in one hemisphere!"
+)
 ERROR_CONSTELLATION_DOES_NOT_EXIST: str = "The constellation does not exist!"
 ERROR_NOT_ENOUGH_POINTS: str = "Number of points must be greater than 2!"
+ERROR_IS_RADIUS_RANGE_VALID: str = "'Radius' must be from 0 to 180!"
+ERROR_STAR_DOES_NOT_EXIST: str = "The star does not exist!"
+ERROR_IS_NUMBER_OF_STARS_VALID: str = "'Number' must be from 1 to 1000!"
+ERROR_IS_NUMBER_OF_POLYGONS_VALID: str = "Number of polygons must be from 1 to 16!"
 
 REDIS_SETTINGS: dict[str, Any] = {
     "host": os.environ.get("REDIS_HOST"),
@@ -147,6 +159,17 @@ REDIS_SETTINGS: dict[str, Any] = {
     "encoding": "utf-8",
     "decode_responses": True,
 }
+REDIS_CHUNK_SIZE: int = int(os.environ.get("REDIS_CHUNK_SIZE", 1000))
+SEARCH_STORAGE: str = os.environ.get("SEARCH_STORAGE", "redis")
+SEARCH_TTL: int = int(os.environ.get("SEARCH_TTL", 3600))
+# Version of the layout of members of the shared sorted sets. Shared sets
+# outlive deployments, so it is part of their prefixes.
+SEARCH_LAYOUT_VERSION: int = 3
+CONSTELLATION_HASH_PREFIX: str = f"constellation:v{SEARCH_LAYOUT_VERSION}:"
+POLYGON_HASH_PREFIX: str = f"polygon:v{SEARCH_LAYOUT_VERSION}:"
+SESSION_STATE_PREFIX: str = f"session:v{SEARCH_LAYOUT_VERSION}:"
+POLYGON_CACHE_PRECISION: int = int(os.environ.get("POLYGON_CACHE_PRECISION", 6))
+POLYGON_CACHE_SIZE: int = int(os.environ.get("POLYGON_CACHE_SIZE", 256))
 
 POSTGRESQL_SETTINGS: dict[str, Optional[str]] = {
     "POSTGRES_HOST": os.environ.get("POSTGRES_HOST"),
@@ -156,7 +179,19 @@ POSTGRESQL_SETTINGS: dict[str, Optional[str]] = {
     "POSTGRES_PASSWORD": os.environ.get("POSTGRES_PASSWORD"),
 }
 
+INGEST_CHUNK_SIZE: int = int(os.environ.get("INGEST_CHUNK_SIZE", 20000))
+
 PAGINATION_SIZE: int = 10
+MAX_PAGINATION_SIZE: int = int(os.environ.get("MAX_PAGINATION_SIZE", 100))
+POLYGON_SEARCH: str = os.environ.get("POLYGON_SEARCH", "memory")
+
+GRID_RA_STEP: float = 0.1
+GRID_DEC_STEP: float = 1.0
+STATISTICS_RA_STEP: float = 0.5
+STATISTICS_DEC_STEP: float = 5.0
+KD_TREE_LEAF_SIZE: int = 32
+MAX_NEAREST_STARS: int = 1000
+MAX_POLYGONS_IN_BATCH: int = 16
 SERVER: str = os.environ.get("HOST", "")
 PORT: int = int(os.environ.get("PORT", 0))
 SERVER_URL: str = SERVER + ":" + str(PORT)
@@ -1,3 +1,25 @@
+from collections.abc import Iterable
+from typing import Union
+
+import numpy as np
+import numpy.typing as npt
+
+EPSILON: float = 1e-9
+
+
+def to_unit_vectors(ra: npt.ArrayLike, dec: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    ra_radians = np.radians(np.asarray(ra, dtype=np.float64) * 15)
+    dec_radians = np.radians(np.asarray(dec, dtype=np.float64))
+    return np.stack(
+        (
+            np.cos(dec_radians) * np.cos(ra_radians),
+            np.cos(dec_radians) * np.sin(ra_radians),
+            np.sin(dec_radians),
+        ),
+        axis=-1,
+    )
+
+
 def is_polygon_contains_point(
     points: list[dict[str, float]], ra: float, dec: float
 ) -> bool:
@@ -17,6 +39,136 @@ def is_polygon_contains_point(
     return result
 
 
+def polygon_contains_points(
+    points: list[dict[str, float]], ra: npt.ArrayLike, dec: npt.ArrayLike
+) -> npt.NDArray[np.bool_]:
+    ra = np.asarray(ra, dtype=np.float64)
+    dec = np.asarray(dec, dtype=np.float64)
+    result: npt.NDArray[np.bool_] = np.zeros(ra.shape, dtype=np.bool_)
+    for i in range(len(points)):
+        first, second = points[i], points[i - 1]
+        if first["dec"] == second["dec"]:
+            continue
+
+        crossing = ((first["dec"] <= dec) & (dec < second["dec"])) | (
+            (second["dec"] <= dec) & (dec < first["dec"])
+        )
+        crossing &= (
+            ra
+            > (second["ra"] - first["ra"])
+            * (dec - first["dec"])
+            / (second["dec"] - first["dec"])
+            + first["ra"]
+        )
+        result ^= crossing
+    return result
+
+
+class CompiledPolygon:
+    """Slab decomposition of a polygon for repeated containment queries.
+    Vertex declinations split the plane into slabs; edges spanning a slab
+    are stored in ra order, so a point needs a binary search over the edges
+    of its slab instead of a pass over every edge. Self-intersecting polygons
+    fall back to polygon_contains_points.
+    """
+
+    points: list[dict[str, float]]
+    is_simple: bool
+    levels: npt.NDArray[np.float64]
+    first_ra: npt.NDArray[np.float64]
+    first_dec: npt.NDArray[np.float64]
+    delta_ra: npt.NDArray[np.float64]
+    delta_dec: npt.NDArray[np.float64]
+    slab_edges: npt.NDArray[np.intp]
+    slab_lengths: npt.NDArray[np.intp]
+
+    def __init__(self, points: list[dict[str, float]]):
+        self.points = list(points)
+        edges: list[tuple[dict[str, float], dict[str, float]]] = [
+            (points[i], points[i - 1])
+            for i in range(len(points))
+            if points[i]["dec"] != points[i - 1]["dec"]
+        ]
+        self.first_ra, self.first_dec, second_ra, second_dec = (
+            np.array([edge[index][key] for edge in edges], dtype=np.float64)
+            for index, key in ((0, "ra"), (0, "dec"), (1, "ra"), (1, "dec"))
+        )
+        self.delta_ra = second_ra - self.first_ra
+        self.delta_dec = second_dec - self.first_dec
+        self.levels = np.unique([point["dec"] for point in points]).astype(np.float64)
+        number_of_slabs: int = max(len(self.levels) - 1, 0)
+
+        first_slabs = np.searchsorted(
+            self.levels, np.minimum(self.first_dec, second_dec)
+        )
+        last_slabs = (
+            np.searchsorted(self.levels, np.maximum(self.first_dec, second_dec)) - 1
+        )
+        slabs: list[list[int]] = [[] for i in range(number_of_slabs)]
+        for edge, (first_slab, last_slab) in enumerate(zip(first_slabs, last_slabs)):
+            for slab in range(first_slab, last_slab + 1):
+                slabs[slab].append(edge)
+
+        self.slab_lengths = np.array([len(slab) for slab in slabs], dtype=np.intp)
+        self.slab_edges = np.zeros(
+            (number_of_slabs, max(self.slab_lengths, default=0)), dtype=np.intp
+        )
+        self.is_simple = True
+        for index, edges_in_slab in enumerate(slabs):
+            edges_of_slab = np.array(edges_in_slab, dtype=np.intp)
+            bottom, middle, top = (
+                self._intercepts(edges_of_slab, dec)
+                for dec in (
+                    self.levels[index],
+                    (self.levels[index] + self.levels[index + 1]) / 2,
+                    self.levels[index + 1],
+                )
+            )
+            order = np.argsort(middle, kind="stable")
+            if np.any(np.diff(bottom[order]) < -EPSILON) or np.any(
+                np.diff(top[order]) < -EPSILON
+            ):
+                self.is_simple = False
+            self.slab_edges[index, : len(edges_of_slab)] = edges_of_slab[order]
+
+    def _intercepts(
+        self, edges: npt.NDArray[np.intp], dec: Union[float, npt.NDArray[np.float64]]
+    ) -> npt.NDArray[np.float64]:
+        result: npt.NDArray[np.float64] = (
+            self.delta_ra[edges] * (dec - self.first_dec[edges]) / self.delta_dec[edges]
+            + self.first_ra[edges]
+        )
+        return result
+
+    def contains(self, ra: npt.ArrayLike, dec: npt.ArrayLike) -> npt.NDArray[np.bool_]:
+        if not self.is_simple:
+            return polygon_contains_points(self.points, ra, dec)
+
+        ra = np.asarray(ra, dtype=np.float64)
+        dec = np.asarray(dec, dtype=np.float64)
+        result: npt.NDArray[np.bool_] = np.zeros(ra.shape, dtype=np.bool_)
+        slabs = np.searchsorted(self.levels, dec, side="right") - 1
+        indexes = np.nonzero((slabs >= 0) & (slabs < len(self.slab_lengths)))[0]
+        if len(indexes) == 0:
+            return result
+
+        slabs, ra, dec = slabs[indexes], ra[indexes], dec[indexes]
+        left = np.zeros(len(indexes), dtype=np.intp)
+        right = self.slab_lengths[slabs]
+        while np.any(left < right):
+            active = left < right
+            middle = (left + right) // 2
+            edges = self.slab_edges[
+                slabs, np.minimum(middle, self.slab_edges.shape[1] - 1)
+            ]
+            is_crossing = ra > self._intercepts(edges, dec)
+            left = np.where(active & is_crossing, middle + 1, left)
+            right = np.where(active & ~is_crossing, middle, right)
+
+        result[indexes] = left % 2 == 1
+        return result
+
+
 def is_points_range_valid(points: list[dict[str, float]]) -> bool:
     for point in points:
         if not (-24 < point["ra"] < 24 and -90 <= point["dec"] <= 90):
@@ -25,34 +177,163 @@ def is_points_range_valid(points: list[dict[str, float]]) -> bool:
     return True
 
 
+def is_points_range_valid_on_sphere(points: list[dict[str, float]]) -> bool:
+    if not is_points_range_valid(points):
+        return False
+
+    vectors = to_unit_vectors(
+        [point["ra"] for point in points], [point["dec"] for point in points]
+    )
+    center = vectors.sum(axis=0)
+    length = np.linalg.norm(center)
+    return bool(length > EPSILON and np.all(vectors @ (center / length) > EPSILON))
+
+
 def Graham_scan(points: list[dict[str, float]]) -> list[dict[str, float]]:
-    def is_right_rotate(
+    def is_left_rotate(
         a: dict[str, float], b: dict[str, float], c: dict[str, float]
     ) -> bool:
         result = (b["ra"] - a["ra"]) * (c["dec"] - b["dec"]) - (b["dec"] - a["dec"]) * (
             c["ra"] - b["ra"]
         )
-        if result < 0:
-            return True
-        else:
-            return False
+        return result > 0
+
+    def build_chain(chain: Iterable[dict[str, float]]) -> list[dict[str, float]]:
+        answer: list[dict[str, float]] = []
+        for point in chain:
+            while len(answer) > 1 and not is_left_rotate(answer[-2], answer[-1], point):
+                del answer[-1]
+            answer.append(point)
+        return answer
+
+    unique_points: dict[tuple[float, float], dict[str, float]] = {}
+    for point in points:
+        unique_points.setdefault((point["dec"], point["ra"]), point)
+
+    sorted_points: list[dict[str, float]] = [
+        unique_points[key] for key in sorted(unique_points)
+    ]
+    if len(sorted_points) < 3:
+        return sorted_points
+
+    right_chain = build_chain(sorted_points)
+    left_chain = build_chain(reversed(sorted_points))
+    return right_chain[:-1] + left_chain[:-1]
+
+
+class GnomonicProjection:
+    """Projection from the centre of the sphere onto the plane tangent at
+    "center". Great circles become straight lines, so planar hulls and
+    containment tests work on the projected coordinates.
+    """
+
+    center: npt.NDArray[np.float64]
+    first_axis: npt.NDArray[np.float64]
+    second_axis: npt.NDArray[np.float64]
+
+    def __init__(self, center: npt.NDArray[np.float64]):
+        self.center = center / np.linalg.norm(center)
+        helper = np.zeros(3)
+        helper[np.argmin(np.abs(self.center))] = 1
+        self.first_axis = np.cross(self.center, helper)
+        self.first_axis /= np.linalg.norm(self.first_axis)
+        self.second_axis = np.cross(self.center, self.first_axis)
+
+    def project(
+        self, vectors: npt.NDArray[np.float64]
+    ) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.bool_]]:
+        heights = vectors @ self.center
+        is_visible = heights > EPSILON
+        heights = np.where(is_visible, heights, 1)
+        return (
+            vectors @ self.first_axis / heights,
+            vectors @ self.second_axis / heights,
+            is_visible,
+        )
 
-    length: int = len(points)
+    def project_points(self, points: list[dict[str, float]]) -> list[dict[str, float]]:
+        x, y, _ = self.project(
+            to_unit_vectors(
+                [point["ra"] for point in points], [point["dec"] for point in points]
+            )
+        )
+        return [{"ra": float(ra), "dec": float(dec)} for ra, dec in zip(x, y)]
+
+
+def _projection_of_points(points: list[dict[str, float]]) -> GnomonicProjection:
+    vectors = to_unit_vectors(
+        [point["ra"] for point in points], [point["dec"] for point in points]
+    )
+    return GnomonicProjection(vectors.sum(axis=0))
+
+
+def spherical_Graham_scan(points: list[dict[str, float]]) -> list[dict[str, float]]:
+    projected_points = _projection_of_points(points).project_points(points)
+    originals: dict[int, dict[str, float]] = {
+        id(projected_point): point
+        for projected_point, point in zip(projected_points, points)
+    }
+    return [originals[id(point)] for point in Graham_scan(projected_points)]
+
+
+def normalize_polygon(
+    points: list[dict[str, float]], precision: int, on_sphere: bool = False
+) -> list[dict[str, float]]:
+    rounded_points: list[dict[str, float]] = [
+        {
+            "ra": round(point["ra"], precision) + 0.0,
+            "dec": round(point["dec"], precision) + 0.0,
+        }
+        for point in points
+    ]
+    if not on_sphere:
+        return Graham_scan(rounded_points)
+
+    hull = spherical_Graham_scan(rounded_points)
+    first: int = min(
+        range(len(hull)), key=lambda index: (hull[index]["dec"], hull[index]["ra"])
+    )
+    return hull[first:] + hull[:first]
 
-    for i in range(1, length):
-        if points[0]["dec"] > points[i]["dec"]:
-            points[0], points[i] = points[i], points[0]
 
-    for i in range(2, length):
-        j = i
-        while j > 1 and is_right_rotate(points[0], points[j - 1], points[j]):
-            points[j], points[j - 1] = points[j - 1], points[j]
-            j -= 1
+class SphericalPolygon:
+    """Polygon with great-circle edges. Stars are tested on their unit vectors
+    in the gnomonic projection centred on the polygon; stars behind the
+    tangent plane are outside. "radius" is the angular radius (degrees) of a
+    cone around "center" that contains the polygon.
+    """
 
-    answer: list[dict[str, float]] = [points[0], points[1]]
-    for i in range(2, length):
-        while is_right_rotate(answer[-2], answer[-1], points[i]):
-            del answer[-1]
-        answer.append(points[i])
+    projection: GnomonicProjection
+    compiled_polygon: CompiledPolygon
+    radius: float
+
+    def __init__(self, points: list[dict[str, float]]):
+        self.projection = _projection_of_points(points)
+        self.compiled_polygon = CompiledPolygon(self.projection.project_points(points))
+        vectors = to_unit_vectors(
+            [point["ra"] for point in points], [point["dec"] for point in points]
+        )
+        self.radius = float(
+            np.degrees(
+                np.arccos(np.clip(vectors @ self.projection.center, -1, 1))
+            ).max()
+        )
+
+    @property
+    def center(self) -> tuple[float, float]:
+        x, y, z = self.projection.center
+        return float(np.degrees(np.arctan2(y, x)) / 15 % 24), float(
+            np.degrees(np.arcsin(np.clip(z, -1, 1)))
+        )
+
+    def contains_vectors(
+        self, vectors: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.bool_]:
+        x, y, is_visible = self.projection.project(vectors)
+        result: npt.NDArray[np.bool_] = is_visible & self.compiled_polygon.contains(
+            x, y
+        )
+        return result
 
-    return answer
+    def contains(self, ra: npt.ArrayLike, dec: npt.ArrayLike) -> npt.NDArray[np.bool_]:
+        return self.contains_vectors(to_unit_vectors(ra, dec))
@@ -0,0 +1,446 @@
+import hashlib
+import heapq
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from models import CatalogAssociation, Source, Star, db
+
+from .constants import (
+    CONSTELLATION,
+    DEC,
+    GRID_DEC_STEP,
+    GRID_RA_STEP,
+    KD_TREE_LEAF_SIZE,
+    NAME,
+    OTHER_DATA,
+    RA,
+    SPECT,
+    STATISTICS_DEC_STEP,
+    STATISTICS_RA_STEP,
+)
+from .geometry import EPSILON, CompiledPolygon, to_unit_vectors
+
+STAR_FIELDS: tuple[str, ...] = ("id", RA, DEC, SPECT, CONSTELLATION, NAME) + OTHER_DATA
+
+
+class DeclinationGrid:
+    """Buckets stars into cells of declination bands split by right ascension.
+    Stars are sorted by cell, so every declination band of a bounding box
+    is a single slice of "order".
+    """
+
+    ra_step: float
+    dec_step: float
+    number_of_ra_cells: int
+    number_of_dec_cells: int
+    order: npt.NDArray[np.intp]
+    offsets: npt.NDArray[np.intp]
+
+    def __init__(
+        self,
+        ra: npt.NDArray[np.float64],
+        dec: npt.NDArray[np.float64],
+        ra_step: float = GRID_RA_STEP,
+        dec_step: float = GRID_DEC_STEP,
+    ):
+        self.ra_step = ra_step
+        self.dec_step = dec_step
+        self.number_of_ra_cells = int(np.ceil(24 / ra_step))
+        self.number_of_dec_cells = int(np.ceil(180 / dec_step))
+
+        cells = (
+            self.dec_cells(dec) * self.number_of_ra_cells + self.ra_cells(ra)
+        ).astype(np.intp)
+        self.order = np.argsort(cells, kind="stable")
+        self.offsets = np.searchsorted(
+            cells[self.order],
+            np.arange(self.number_of_ra_cells * self.number_of_dec_cells + 1),
+        )
+
+    def ra_cells(self, ra: npt.ArrayLike) -> npt.NDArray[np.intp]:
+        cells = np.floor(np.asarray(ra, dtype=np.float64) / self.ra_step)
+        result: npt.NDArray[np.intp] = np.clip(
+            cells, 0, self.number_of_ra_cells - 1
+        ).astype(np.intp)
+        return result
+
+    def dec_cells(self, dec: npt.ArrayLike) -> npt.NDArray[np.intp]:
+        cells = np.floor((np.asarray(dec, dtype=np.float64) + 90) / self.dec_step)
+        result: npt.NDArray[np.intp] = np.clip(
+            cells, 0, self.number_of_dec_cells - 1
+        ).astype(np.intp)
+        return result
+
+    def candidates(
+        self, min_ra: float, max_ra: float, min_dec: float, max_dec: float
+    ) -> npt.NDArray[np.intp]:
+        first_ra, last_ra = self.ra_cells([min_ra, max_ra])
+        first_dec, last_dec = self.dec_cells([min_dec, max_dec])
+        rows = np.arange(first_dec, last_dec + 1) * self.number_of_ra_cells
+        starts = self.offsets[rows + first_ra]
+        ends = self.offsets[rows + last_ra + 1]
+        indexes = np.concatenate(
+            [self.order[start:end] for start, end in zip(starts, ends)]
+        )
+        return np.sort(indexes)
+
+
+class KDTree:
+    """Static k-d tree with nodes kept in flat lists. Every node owns the
+    slice order[starts[node]:ends[node]] and its bounding box; leaves are
+    scanned with NumPy.
+    """
+
+    points: npt.NDArray[np.float64]
+    order: npt.NDArray[np.intp]
+    starts: list[int]
+    ends: list[int]
+    children: list[tuple[int, int]]
+    lower_bounds: npt.NDArray[np.float64]
+    upper_bounds: npt.NDArray[np.float64]
+
+    def __init__(
+        self, points: npt.NDArray[np.float64], leaf_size: int = KD_TREE_LEAF_SIZE
+    ):
+        self.points = points
+        self.order = np.arange(len(points), dtype=np.intp)
+        self.starts, self.ends, self.children = [], [], []
+        lower_bounds: list[npt.NDArray[np.float64]] = []
+        upper_bounds: list[npt.NDArray[np.float64]] = []
+
+        stack: list[tuple[int, int, int]] = [(0, len(points), -1)]
+        while stack:
+            start, end, parent = stack.pop()
+            node: int = len(self.starts)
+            if parent >= 0:
+                left, right = self.children[parent]
+                self.children[parent] = (node, right) if left == -1 else (left, node)
+
+            node_points = points[self.order[start:end]]
+            lower = (
+                node_points.min(axis=0) if end > start else np.zeros(points.shape[1])
+            )
+            upper = (
+                node_points.max(axis=0) if end > start else np.zeros(points.shape[1])
+            )
+            self.starts.append(start)
+            self.ends.append(end)
+            self.children.append((-1, -1))
+            lower_bounds.append(lower)
+            upper_bounds.append(upper)
+
+            if end - start > leaf_size:
+                axis = int(np.argmax(upper - lower))
+                middle: int = (start + end) // 2
+                partition = np.argpartition(node_points[:, axis], middle - start)
+                self.order[start:end] = self.order[start:end][partition]
+                stack.append((middle, end, node))
+                stack.append((start, middle, node))
+
+        self.lower_bounds = np.array(lower_bounds, dtype=np.float64)
+        self.upper_bounds = np.array(upper_bounds, dtype=np.float64)
+
+    def _distances_to_box(
+        self, node: int, point: npt.NDArray[np.float64]
+    ) -> tuple[float, float]:
+        lower, upper = self.lower_bounds[node], self.upper_bounds[node]
+        nearest = np.clip(point, lower, upper)
+        farthest = np.where(point - lower > upper - point, lower, upper)
+        return (
+            float(np.linalg.norm(point - nearest)),
+            float(np.linalg.norm(point - farthest)),
+        )
+
+    def query_radius(self, point: npt.ArrayLike, radius: float) -> npt.NDArray[np.intp]:
+        point = np.asarray(point, dtype=np.float64)
+        result: list[npt.NDArray[np.intp]] = [np.empty(0, dtype=np.intp)]
+        stack: list[int] = [0] if len(self.points) else []
+        while stack:
+            node = stack.pop()
+            minimum, maximum = self._distances_to_box(node, point)
+            if minimum > radius:
+                continue
+
+            indexes = self.order[self.starts[node] : self.ends[node]]
+            if maximum <= radius:
+                result.append(indexes)
+            elif self.children[node] == (-1, -1):
+                distances = np.linalg.norm(self.points[indexes] - point, axis=1)
+                result.append(indexes[distances <= radius])
+            else:
+                stack.extend(self.children[node])
+
+        return np.sort(np.concatenate(result))
+
+    def query_nearest(
+        self, point: npt.ArrayLike, k: int
+    ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float64]]:
+        point = np.asarray(point, dtype=np.float64)
+        best_indexes = np.empty(0, dtype=np.intp)
+        best_distances = np.empty(0, dtype=np.float64)
+        heap: list[tuple[float, int]] = [(0.0, 0)] if len(self.points) else []
+        while heap:
+            minimum, node = heapq.heappop(heap)
+            if len(best_distances) == k and minimum > best_distances[-1]:
+                break
+
+            if self.children[node] == (-1, -1):
+                indexes = self.order[self.starts[node] : self.ends[node]]
+                distances = np.linalg.norm(self.points[indexes] - point, axis=1)
+                best_indexes = np.concatenate((best_indexes, indexes))
+                best_distances = np.concatenate((best_distances, distances))
+                nearest = np.lexsort((best_indexes, best_distances))[:k]
+                best_indexes = best_indexes[nearest]
+                best_distances = best_distances[nearest]
+            else:
+                for child in self.children[node]:
+                    heapq.heappush(
+                        heap, (self._distances_to_box(child, point)[0], child)
+                    )
+
+        return best_indexes, best_distances
+
+
+def _codes_of_values(values: list[Any]) -> tuple[list[Any], npt.NDArray[np.intp]]:
+    codes: dict[Any, int] = {}
+    result = np.array(
+        [codes.setdefault(value, len(codes)) for value in values], dtype=np.intp
+    )
+    return list(codes), result
+
+
+class CellStatistics:
+    """Counts of spects, catalog tags and constellations for every cell of a
+    coarse DeclinationGrid. Cells inside a convex polygon are summed, only
+    stars of the boundary cells are tested one by one.
+    """
+
+    grid: DeclinationGrid
+    ra: npt.NDArray[np.float64]
+    dec: npt.NDArray[np.float64]
+    spects: list[str]
+    catalogs: list[str]
+    constellations: list[str]
+    spect_codes: npt.NDArray[np.intp]
+    catalog_matrix: npt.NDArray[np.int64]
+    constellation_codes: npt.NDArray[np.intp]
+    counts: npt.NDArray[np.int64]
+
+    def __init__(
+        self,
+        stars: list[dict[str, Any]],
+        catalogs_of_stars: list[list[str]],
+        ra: npt.NDArray[np.float64],
+        dec: npt.NDArray[np.float64],
+    ):
+        self.grid = DeclinationGrid(ra, dec, STATISTICS_RA_STEP, STATISTICS_DEC_STEP)
+        self.ra, self.dec = ra, dec
+        self.spects, self.spect_codes = _codes_of_values(
+            [star[SPECT] for star in stars]
+        )
+        self.constellations, self.constellation_codes = _codes_of_values(
+            [star[CONSTELLATION] for star in stars]
+        )
+        self.catalogs, catalog_codes = _codes_of_values(
+            [tag for catalogs_of_star in catalogs_of_stars for tag in catalogs_of_star]
+        )
+        self.catalog_matrix = np.zeros((len(stars), len(self.catalogs)), np.int64)
+        np.add.at(
+            self.catalog_matrix,
+            (
+                np.repeat(
+                    np.arange(len(stars)),
+                    [len(catalogs_of_star) for catalogs_of_star in catalogs_of_stars],
+                ),
+                catalog_codes,
+            ),
+            1,
+        )
+
+        stars_by_cell = np.zeros(len(stars), dtype=np.intp)
+        cells = len(self.grid.offsets) - 1
+        stars_by_cell[self.grid.order] = np.repeat(
+            np.arange(cells), np.diff(self.grid.offsets)
+        )
+        number_of_spects, number_of_catalogs = len(self.spects), len(self.catalogs)
+        self.counts = np.zeros(
+            (cells, number_of_spects + number_of_catalogs + len(self.constellations)),
+            np.int64,
+        )
+        np.add.at(self.counts, (stars_by_cell, self.spect_codes), 1)
+        np.add.at(
+            self.counts[:, number_of_spects : number_of_spects + number_of_catalogs],
+            stars_by_cell,
+            self.catalog_matrix,
+        )
+        np.add.at(
+            self.counts,
+            (
+                stars_by_cell,
+                number_of_spects + number_of_catalogs + self.constellation_codes,
+            ),
+            1,
+        )
+
+    def _cells_of_polygon(
+        self, points: list[dict[str, float]], polygon: CompiledPolygon
+    ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.bool_]]:
+        ra = [point["ra"] for point in points]
+        dec = [point["dec"] for point in points]
+        first_ra, last_ra = self.grid.ra_cells([min(ra), max(ra)])
+        first_dec, last_dec = self.grid.dec_cells([min(dec), max(dec)])
+        ra_cells, dec_cells = np.meshgrid(
+            np.arange(first_ra, last_ra + 1), np.arange(first_dec, last_dec + 1)
+        )
+        ra_cells, dec_cells = ra_cells.ravel(), dec_cells.ravel()
+
+        is_inside = np.ones(len(ra_cells), dtype=np.bool_)
+        for ra_side, dec_side in ((0, 0), (1, 0), (0, 1), (1, 1)):
+            is_inside &= polygon.contains(
+                (ra_cells + ra_side) * self.grid.ra_step + (2 * ra_side - 1) * EPSILON,
+                (dec_cells + dec_side) * self.grid.dec_step
+                - 90
+                + (2 * dec_side - 1) * EPSILON,
+            )
+        return dec_cells * self.grid.number_of_ra_cells + ra_cells, is_inside
+
+    def statistics(
+        self, points: list[dict[str, float]]
+    ) -> tuple[int, Counter[str], Counter[str], Counter[str]]:
+        polygon = CompiledPolygon(points)
+        cells, is_inside = self._cells_of_polygon(points, polygon)
+        offsets = self.grid.offsets
+        inner_cells = cells[is_inside]
+        counts = self.counts[inner_cells].sum(axis=0)
+        number_of_stars = int((offsets[inner_cells + 1] - offsets[inner_cells]).sum())
+
+        boundary_cells = cells[~is_inside]
+        candidates = np.concatenate(
+            [np.empty(0, dtype=np.intp)]
+            + [
+                self.grid.order[offsets[cell] : offsets[cell + 1]]
+                for cell in boundary_cells
+            ]
+        )
+        inside = candidates[polygon.contains(self.ra[candidates], self.dec[candidates])]
+        number_of_stars += len(inside)
+        counts += np.concatenate(
+            (
+                np.bincount(self.spect_codes[inside], minlength=len(self.spects)),
+                self.catalog_matrix[inside].sum(axis=0),
+                np.bincount(
+                    self.constellation_codes[inside],
+                    minlength=len(self.constellations),
+                ),
+            )
+        )
+
+        counters: list[Counter[str]] = []
+        start: int = 0
+        for values in (self.spects, self.catalogs, self.constellations):
+            counters.append(
+                Counter(
+                    {
+                        value: int(count)
+                        for value, count in zip(
+                            values, counts[start : start + len(values)]
+                        )
+                        if count
+                    }
+                )
+            )
+            start += len(values)
+
+        spects, catalogs, constellations = counters
+        return number_of_stars, spects, catalogs, constellations
+
+
+class StarIndex:
+    stars: list[dict[str, Any]]
+    catalogs: list[list[str]]
+    ra: npt.NDArray[np.float64]
+    dec: npt.NDArray[np.float64]
+    indexes: dict[int, int]
+    grid: DeclinationGrid
+    sky_tree: KDTree
+    space_tree: KDTree
+    cell_statistics: CellStatistics
+
+    def __init__(self, stars: list[dict[str, Any]], catalogs: list[list[str]]) -> None:
+        self.stars = stars
+        self.catalogs = catalogs
+        self.ra = np.array([star[RA] for star in stars], dtype=np.float64)
+        self.dec = np.array([star[DEC] for star in stars], dtype=np.float64)
+        self.indexes = {star["id"]: index for index, star in enumerate(stars)}
+        self.grid = DeclinationGrid(self.ra, self.dec)
+
+        unit_vectors = to_unit_vectors(self.ra, self.dec)
+        distances = np.array([star["dist"] for star in stars], dtype=np.float64)
+        self.sky_tree = KDTree(unit_vectors)
+        self.space_tree = KDTree(unit_vectors * distances.reshape(-1, 1))
+        self.cell_statistics = CellStatistics(stars, catalogs, self.ra, self.dec)
+
+    def candidates(self, points: list[dict[str, float]]) -> npt.NDArray[np.intp]:
+        ra = [point["ra"] for point in points]
+        dec = [point["dec"] for point in points]
+        return self.grid.candidates(min(ra), max(ra), min(dec), max(dec))
+
+    def cone(self, ra: float, dec: float, radius: float) -> npt.NDArray[np.intp]:
+        chord: float = 2 * np.sin(np.radians(min(radius, 180)) / 2)
+        return self.sky_tree.query_radius(to_unit_vectors(ra, dec), chord)
+
+    def nearest(
+        self,
+        position: npt.ArrayLike,
+        number: int,
+        radius: Optional[float] = None,
+    ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.float64]]:
+        if radius is None:
+            return self.space_tree.query_nearest(position, number)
+
+        indexes = self.space_tree.query_radius(position, radius)
+        distances = np.linalg.norm(
+            self.space_tree.points[indexes] - np.asarray(position), axis=1
+        )
+        order = np.lexsort((indexes, distances))[:number]
+        return indexes[order], distances[order]
+
+
+def get_data_version() -> str:
+    """Digest of the fingerprints of the downloaded files. It changes with
+    every download that changes the stars.
+    """
+    sha256 = hashlib.sha256()
+    for (fingerprint,) in db.session.query(Source.fingerprint).order_by(Source.path):
+        sha256.update(fingerprint.encode())
+    return sha256.hexdigest()[:16]
+
+
+def get_star_index(data_version: Optional[str] = None) -> StarIndex:
+    """Index of the stars, reloaded when the data version changes. Callers
+    that already know the version pass it to save the query.
+    """
+    return _load_star_index(
+        get_data_version() if data_version is None else data_version
+    )
+
+
+@lru_cache(maxsize=1)
+def _load_star_index(data_version: str) -> StarIndex:
+    stars: list[dict[str, Any]] = [
+        {key: field for key, field in zip(STAR_FIELDS, row)}
+        for row in db.session.query(
+            *[getattr(Star, field) for field in STAR_FIELDS]
+        ).all()
+    ]
+    catalogs_of_stars: dict[int, list[str]] = {star["id"]: [] for star in stars}
+    for star_id, catalog_tag in db.session.query(
+        CatalogAssociation.star_id, CatalogAssociation.catalog_tag
+    ).all():
+        catalogs_of_stars[star_id].append(catalog_tag)
+
+    return StarIndex(stars, [catalogs_of_stars[star["id"]] for star in stars])
@@ -1,27 +1,60 @@
+import hashlib
+import json
+import math
 import random
 import string
 from collections import Counter
-from typing import Any, Union
+from typing import Any, Optional, Union
 
+import numpy as np
 from flask import Blueprint, Response, jsonify, render_template, request, session
 from sqlalchemy import text
 
-from models import CatalogAssociation, Constellation, Star, db
+from models import Constellation, db
 
-from .algorithms import Search, TypeSearch
+from .algorithms import (
+    Search,
+    TypeSearch,
+    get_polygon_cache,
+    load_session_state,
+    save_session_state,
+)
 from .constants import (
     CATALOGS,
     CONSTELLATION,
+    CONSTELLATION_HASH_PREFIX,
     DEC,
     ERROR_CONSTELLATION_DOES_NOT_EXIST,
+    ERROR_IS_NUMBER_OF_POLYGONS_VALID,
+    ERROR_IS_NUMBER_OF_STARS_VALID,
     ERROR_IS_POINTS_RANGE_VALID,
+    ERROR_IS_POINTS_RANGE_VALID_ON_SPHERE,
+    ERROR_IS_RADIUS_RANGE_VALID,
     ERROR_NOT_ENOUGH_POINTS,
+    ERROR_STAR_DOES_NOT_EXIST,
+    MAX_NEAREST_STARS,
+    MAX_PAGINATION_SIZE,
+    MAX_POLYGONS_IN_BATCH,
+    NAME,
     OTHER_DATA,
+    PAGINATION_SIZE,
+    POLYGON_CACHE_PRECISION,
+    POLYGON_HASH_PREFIX,
+    POLYGON_SEARCH,
     RA,
     REDIS_SETTINGS,
     SPECT,
 )
-from .geometry import Graham_scan, is_points_range_valid, is_polygon_contains_point
+from .geometry import (
+    CompiledPolygon,
+    Graham_scan,
+    SphericalPolygon,
+    is_points_range_valid,
+    is_points_range_valid_on_sphere,
+    normalize_polygon,
+    to_unit_vectors,
+)
+from .spatial import STAR_FIELDS, StarIndex, get_data_version, get_star_index
 
 bp_views = Blueprint("views", __name__)
 
@@ -47,18 +80,21 @@ def about() -> Response:
 
 @bp_views.route("/delete_all", methods=["GET"])  # type: ignore
 def delete_all() -> Any:
-    hash_: Union[str, None] = session.get("request")
-    if hash_ is not None:
-        Search.clear(hash_=hash_)
-        session.pop("request")
-
+    _clear_session()
     return jsonify()
 
 
 def _result_from_stars_with_constellation_to_dict(
     tag: str,
 ) -> tuple[list[dict[str, Any]], int]:
-    star_fields: tuple[str, ...] = (RA, DEC, SPECT, "id", CONSTELLATION) + OTHER_DATA
+    star_fields: tuple[str, ...] = (
+        RA,
+        DEC,
+        SPECT,
+        "id",
+        CONSTELLATION,
+        NAME,
+    ) + OTHER_DATA
     star_fields_str: str = ""
     for star_field in star_fields:
         star_fields_str += star_field + ","
@@ -69,9 +105,10 @@ def _result_from_stars_with_constellation_to_dict(
         for row in db.session.execute(
             text(
                 f"""
-                    SELECT {star_fields_str} FROM stars_with_{tag};
+                    SELECT {star_fields_str} FROM star WHERE con = :tag;
                 """
-            )
+            ),
+            {"tag": tag},
         ).fetchall()
     ]
     return stars, len(stars)
@@ -81,55 +118,41 @@ def _result_from_stars_with_constellation_to_dict(
 def get_data_from_constellation() -> Any:
     tag = request.json["tag"]
     if Constellation.query.get(tag) is not None:
-        create_stars_with_constellation = text(
-            f"""
-                CREATE VIEW stars_with_catalogs AS
-                    SELECT * FROM catalog_association RIGHT OUTER JOIN stars_with_{tag}
-                    ON catalog_association.star_id=stars_with_{tag}.id;
-            """
-        )
-
         catalog_search = text(
             """
-                SELECT catalog_tag, (CAST(count(*) AS float) / CAST((SELECT count(*) 
+                WITH stars_with_catalogs AS (
+                    SELECT catalog_tag FROM catalog_association RIGHT OUTER JOIN star
+                    ON catalog_association.star_id=star.id WHERE star.con = :tag
+                )
+                SELECT catalog_tag, (CAST(count(*) AS float) / CAST((SELECT count(*)
                 FROM stars_with_catalogs) AS float) * 100)
-                FROM stars_with_catalogs GROUP BY catalog_tag;
+                FROM stars_with_catalogs GROUP BY catalog_tag ORDER BY catalog_tag;
             """
         )
 
         spect_search = text(
-            f"""
-                SELECT spect, (CAST(count(*) AS float) / CAST((SELECT count(*) 
-                FROM stars_with_{tag}) AS float) * 100)
-                FROM stars_with_{tag} GROUP BY spect;
+            """
+                SELECT spect, (CAST(count(*) AS float) / CAST((SELECT count(*)
+                FROM star WHERE con = :tag) AS float) * 100)
+                FROM star WHERE con = :tag GROUP BY spect ORDER BY spect;
             """
         )
 
-        db.session.execute(create_stars_with_constellation)
-
         catalogs = [
             {key: field for key, field in zip(("tag", "percentage"), catalog)}
-            for catalog in db.session.execute(catalog_search)
+            for catalog in db.session.execute(catalog_search, {"tag": tag})
         ]
         spects = [
             {key: field for key, field in zip(("spect", "percentage"), spect)}
-            for spect in db.session.execute(spect_search)
+            for spect in db.session.execute(spect_search, {"tag": tag})
         ]
 
-        session_request = session.get("request")
-        if session_request is not None:
-            old_hash = session_request
-            session.pop("request")
-            Search.clear(hash_=old_hash)
-
-        hash_ = get_hash()
-        session["request"] = hash_
+        _clear_session()
 
-        stars: list[dict[str, Any]]
+        hash_: str
         number_of_stars: int
-        stars, number_of_stars = _result_from_stars_with_constellation_to_dict(tag)
-        for type_search in TypeSearch:
-            Search(hash_, type_search, stars=stars)
+        hash_, number_of_stars = create_constellation_search(tag)
+        session["request"] = hash_
 
         return jsonify(
             {
@@ -167,68 +190,400 @@ def _counter_with_percentage(
     return sorted(with_percentage, key=lambda x: x["percentage"], reverse=True)
 
 
+def _statistics_of_stars(
+    stars: list[dict[str, Any]], catalogs_of_stars: list[list[str]]
+) -> dict[str, Any]:
+    spects: Counter[str]
+    catalogs: Counter[str]
+    constellations: Counter[str]
+    spects, catalogs, constellations = (Counter() for i in range(3))  # type: ignore
+    for star, catalogs_of_star in zip(stars, catalogs_of_stars):
+        spects.update([star[SPECT]])
+        catalogs.update(catalogs_of_star)
+        constellations.update([star[CONSTELLATION]])
+
+    return _statistics_from_counters(len(stars), spects, catalogs, constellations)
+
+
+def _statistics_from_counters(
+    number_of_stars: int,
+    spects: Counter[str],
+    catalogs: Counter[str],
+    constellations: Counter[str],
+) -> dict[str, Any]:
+    return {
+        "number_of_stars": number_of_stars,
+        "catalogs": _counter_with_percentage(catalogs, "tag"),
+        "spects": _counter_with_percentage(spects, "spect"),
+        "constellations": _counter_with_percentage(constellations, "tag"),
+    }
+
+
+def _clear_session() -> None:
+    hashes: list[str] = []
+    session_request = session.get("request")
+    if session_request is not None:
+        hashes.append(session_request)
+        session.pop("request")
+
+    if "reference" in session:
+        hashes.extend(load_session_state(session["reference"]).get("batch", []))
+        save_session_state(session["reference"], {})
+    polygon_cache = get_polygon_cache()
+    for hash_ in hashes:
+        if not hash_.startswith(POLYGON_HASH_PREFIX):
+            Search.clear(hash_=hash_)
+        elif polygon_cache is not None:
+            polygon_cache.release(hash_, _session_reference())
+
+
+def _session_reference() -> str:
+    if "reference" not in session:
+        session["reference"] = get_hash()
+
+    reference: str = session["reference"]
+    return reference
+
+
+def _create_search(stars: list[dict[str, Any]]) -> str:
+    hash_: str = get_hash()
+    for type_search in TypeSearch:
+        Search(hash_, type_search, stars=stars)
+
+    return hash_
+
+
+def get_constellation_hash_prefix(data_version: Optional[str] = None) -> str:
+    """Constellation selections are shared and persistent, so their hashes
+    hold the version of the data they were built from.
+    """
+    if data_version is None:
+        data_version = get_data_version()
+    return CONSTELLATION_HASH_PREFIX + data_version + ":"
+
+
+def create_constellation_search(tag: str, rebuild: bool = False) -> tuple[str, int]:
+    """Hash and number of stars of the selection of the constellation. The
+    stars are only read from the database when the selection has to be
+    built.
+    """
+    hash_: str = get_constellation_hash_prefix() + tag
+    if not rebuild:
+        try:
+            searches = [Search(hash_, type_search) for type_search in TypeSearch]
+            return hash_, searches[0].length
+        except KeyError:
+            pass
+
+    stars: list[dict[str, Any]]
+    number_of_stars: int
+    stars, number_of_stars = _result_from_stars_with_constellation_to_dict(tag)
+    Search.clear(hash_=hash_)
+    for type_search in TypeSearch:
+        Search(hash_, type_search, stars=stars, rebuild=True)
+
+    return hash_, number_of_stars
+
+
+def _polygon_hash(
+    points: list[dict[str, float]], geometry: str, data_version: str
+) -> str:
+    content: str = json.dumps(
+        {"geometry": geometry, "points": points, "version": data_version}
+    )
+    return POLYGON_HASH_PREFIX + hashlib.sha256(content.encode()).hexdigest()
+
+
+def _hash_of_request(state: Optional[dict[str, Any]] = None) -> Optional[str]:
+    hash_: Optional[str] = request.json.get("hash")
+    if hash_ is not None:
+        if state is None:
+            state = load_session_state(_session_reference())
+        return hash_ if hash_ in state.get("batch", []) else None
+
+    return session.get("request")
+
+
+def _is_points_request_valid(points: Any) -> bool:
+    if not isinstance(points, list):
+        return False
+
+    for point in points:
+        if not isinstance(point, dict) or list(point.keys()) != ["ra", "dec"]:
+            return False
+
+    return True
+
+
+def _stars_in_polygon_from_index(
+    points: list[dict[str, float]], data_version: Optional[str] = None
+) -> tuple[list[dict[str, Any]], list[list[str]]]:
+    return _stars_in_polygons_from_index([points], data_version)[0]
+
+
+def _stars_in_polygons_from_index(
+    polygons: list[list[dict[str, float]]], data_version: Optional[str] = None
+) -> list[tuple[list[dict[str, Any]], list[list[str]]]]:
+    star_index: StarIndex = get_star_index(data_version)
+    candidates = np.unique(
+        np.concatenate([star_index.candidates(points) for points in polygons])
+    )
+    ra, dec = star_index.ra[candidates], star_index.dec[candidates]
+
+    result: list[tuple[list[dict[str, Any]], list[list[str]]]] = []
+    for points in polygons:
+        inside = candidates[CompiledPolygon(points).contains(ra, dec)]
+        result.append(
+            (
+                [dict(star_index.stars[index]) for index in inside],
+                [star_index.catalogs[index] for index in inside],
+            )
+        )
+    return result
+
+
+def _stars_in_spherical_polygon_from_index(
+    points: list[dict[str, float]], data_version: Optional[str] = None
+) -> tuple[list[dict[str, Any]], list[list[str]]]:
+    star_index: StarIndex = get_star_index(data_version)
+    polygon = SphericalPolygon(points)
+    candidates = star_index.cone(*polygon.center, polygon.radius)
+    inside = candidates[
+        polygon.contains_vectors(star_index.sky_tree.points[candidates])
+    ]
+    return (
+        [dict(star_index.stars[index]) for index in inside],
+        [star_index.catalogs[index] for index in inside],
+    )
+
+
+def _stars_in_polygon_from_database(
+    points: list[dict[str, float]]
+) -> tuple[list[dict[str, Any]], list[list[str]]]:
+    polygon: str = ",".join(f"({point['ra']},{point['dec']})" for point in points)
+    candidates: list[dict[str, Any]] = [
+        {key: field for key, field in zip(STAR_FIELDS, row)}
+        for row in db.session.execute(
+            text(
+                f"""
+                    SELECT {",".join(STAR_FIELDS)} FROM star
+                    WHERE position <@ CAST(:polygon AS polygon) ORDER BY id;
+                """
+            ),
+            {"polygon": f"({polygon})"},
+        ).fetchall()
+    ]
+    inside = CompiledPolygon(points).contains(
+        [star[RA] for star in candidates],
+        [star[DEC] for star in candidates],
+    )
+    stars: list[dict[str, Any]] = [
+        star for star, is_inside in zip(candidates, inside) if is_inside
+    ]
+
+    catalogs: dict[int, list[str]] = {star["id"]: [] for star in stars}
+    for star_id, catalog_tag in db.session.execute(
+        text(
+            """
+                SELECT star_id, catalog_tag FROM catalog_association
+                WHERE star_id = ANY(:ids);
+            """
+        ),
+        {"ids": list(catalogs.keys())},
+    ):
+        catalogs[star_id].append(catalog_tag)
+
+    return stars, [catalogs[star["id"]] for star in stars]
+
+
 @bp_views.route("/search_points", methods=["POST"])  # type: ignore
 def get_data_with_points() -> Any:
     points: Any = request.json
-    if isinstance(points, list):
-        for point in points:
-            if not isinstance(point, dict):
-                return "bad request", 400
-
-            if list(point.keys()) != ["ra", "dec"]:
-                return "bad request", 400
-    else:
+    if not _is_points_request_valid(points):
         return "bad request", 400
 
     if len(points) < 3:
         return jsonify({"error": ERROR_NOT_ENOUGH_POINTS})
 
-    if is_points_range_valid(points):
-        stars: list[dict[str, Any]] = []
-        convex_polygon: list[dict[str, float]] = Graham_scan(points)
-        spects: Counter[str]
-        catalogs: Counter[str]
-        constellations: Counter[str]
-        spects, catalogs, constellations = (Counter() for i in range(3))  # type: ignore
-        for star in Star.query.all():
-            if is_polygon_contains_point(points, star.ra, star.dec):
-                star_dict: dict[str, Any] = vars(star)
-                star_dict.pop("_sa_instance_state")
-                stars.append(star_dict)
-                spects.update([star.spect])
-                catalogs.update(
-                    [
-                        catalog_association.catalog_tag
-                        for catalog_association in CatalogAssociation.query.filter_by(
-                            star_id=star.id
-                        )
-                    ]
-                )
-                constellations.update([star.con])
-
-        session_request = session.get("request")
-        if session_request is not None:
-            old_hash = session_request
-            session.pop("request")
-            Search.clear(hash_=old_hash)
+    geometry: str = "sphere" if request.args.get("geometry") == "sphere" else "flat"
+    if geometry == "sphere" and not is_points_range_valid_on_sphere(points):
+        return jsonify({"error": ERROR_IS_POINTS_RANGE_VALID_ON_SPHERE})
+    if geometry == "flat" and not is_points_range_valid(points):
+        return jsonify({"error": ERROR_IS_POINTS_RANGE_VALID})
 
-        hash_: str = get_hash()
-        session["request"] = hash_
+    convex_polygon: list[dict[str, float]] = normalize_polygon(
+        points, POLYGON_CACHE_PRECISION, on_sphere=geometry == "sphere"
+    )
+    data_version: str = get_data_version()
+    hash_: str = _polygon_hash(convex_polygon, geometry, data_version)
+    _clear_session()
+
+    polygon_cache = get_polygon_cache()
+    reference: str = _session_reference()
+    statistics: Optional[dict[str, Any]] = (
+        None if polygon_cache is None else polygon_cache.get(hash_, reference)
+    )
+    if statistics is None:
+        stars: list[dict[str, Any]]
+        catalogs_of_stars: list[list[str]]
+        if geometry == "sphere":
+            stars, catalogs_of_stars = _stars_in_spherical_polygon_from_index(
+                convex_polygon, data_version
+            )
+        elif POLYGON_SEARCH == "sql":
+            stars, catalogs_of_stars = _stars_in_polygon_from_database(convex_polygon)
+        else:
+            stars, catalogs_of_stars = _stars_in_polygon_from_index(
+                convex_polygon, data_version
+            )
 
+        statistics = _statistics_of_stars(stars, catalogs_of_stars)
+        Search.clear(hash_=hash_)
         for type_search in TypeSearch:
             Search(hash_, type_search, stars=stars)
+        if polygon_cache is not None:
+            polygon_cache.put(hash_, statistics, reference)
 
-        return jsonify(
+    session["request"] = hash_
+    return jsonify(statistics)
+
+
+@bp_views.route("/search_points_statistics", methods=["POST"])  # type: ignore
+def get_statistics_with_points() -> Any:
+    points: Any = request.json
+    if not _is_points_request_valid(points):
+        return "bad request", 400
+
+    if len(points) < 3:
+        return jsonify({"error": ERROR_NOT_ENOUGH_POINTS})
+
+    if not is_points_range_valid(points):
+        return jsonify({"error": ERROR_IS_POINTS_RANGE_VALID})
+
+    return jsonify(
+        _statistics_from_counters(
+            *get_star_index().cell_statistics.statistics(Graham_scan(points))
+        )
+    )
+
+
+@bp_views.route("/search_points_batch", methods=["POST"])  # type: ignore
+def get_data_with_polygons() -> Any:
+    polygons: Any = request.json
+    if not isinstance(polygons, list):
+        return "bad request", 400
+
+    for points in polygons:
+        if not _is_points_request_valid(points):
+            return "bad request", 400
+
+    if not 0 < len(polygons) <= MAX_POLYGONS_IN_BATCH:
+        return jsonify({"error": ERROR_IS_NUMBER_OF_POLYGONS_VALID})
+
+    for points in polygons:
+        if len(points) < 3:
+            return jsonify({"error": ERROR_NOT_ENOUGH_POINTS})
+
+        if not is_points_range_valid(points):
+            return jsonify({"error": ERROR_IS_POINTS_RANGE_VALID})
+
+    _clear_session()
+    result: list[dict[str, Any]] = []
+    for stars, catalogs_of_stars in _stars_in_polygons_from_index(
+        [Graham_scan(points) for points in polygons]
+    ):
+        result.append(
             {
-                "number_of_stars": len(stars),
-                "catalogs": _counter_with_percentage(catalogs, "tag"),
-                "spects": _counter_with_percentage(spects, "spect"),
-                "constellations": _counter_with_percentage(constellations, "tag"),
+                **_statistics_of_stars(stars, catalogs_of_stars),
+                "hash": _create_search(stars),
             }
         )
-    else:
+
+    save_session_state(
+        _session_reference(), {"batch": [statistics["hash"] for statistics in result]}
+    )
+    return jsonify(result)
+
+
+@bp_views.route("/search_cone", methods=["POST"])  # type: ignore
+def get_data_with_cone() -> Any:
+    cone: Any = request.json
+    if not isinstance(cone, dict) or sorted(cone.keys()) != ["dec", "ra", "radius"]:
+        return "bad request", 400
+
+    try:
+        ra, dec, radius = float(cone["ra"]), float(cone["dec"]), float(cone["radius"])
+    except (TypeError, ValueError):
+        return "bad request", 400
+
+    if not is_points_range_valid([{"ra": ra, "dec": dec}]):
         return jsonify({"error": ERROR_IS_POINTS_RANGE_VALID})
 
+    if not 0 < radius <= 180:
+        return jsonify({"error": ERROR_IS_RADIUS_RANGE_VALID})
+
+    star_index: StarIndex = get_star_index()
+    indexes = star_index.cone(ra, dec, radius)
+    stars: list[dict[str, Any]] = [dict(star_index.stars[index]) for index in indexes]
+
+    _clear_session()
+    session["request"] = _create_search(stars)
+    return jsonify(
+        _statistics_of_stars(stars, [star_index.catalogs[index] for index in indexes])
+    )
+
+
+@bp_views.route("/search_nearest", methods=["POST"])  # type: ignore
+def get_nearest_stars() -> Any:
+    data: Any = request.json
+    if not isinstance(data, dict):
+        return "bad request", 400
+
+    keys: list[str] = sorted(key for key in data.keys() if key != "radius")
+    if keys not in (["id", "number"], ["dec", "dist", "number", "ra"]):
+        return "bad request", 400
+
+    try:
+        number: int = int(data["number"])
+        radius: Optional[float] = (
+            float(data["radius"]) if data.get("radius") is not None else None
+        )
+        star_id: Optional[int] = int(data["id"]) if "id" in data else None
+        point: dict[str, float] = (
+            {} if "id" in data else {"ra": float(data["ra"]), "dec": float(data["dec"])}
+        )
+        dist: float = 0 if "id" in data else float(data["dist"])
+    except (TypeError, ValueError):
+        return "bad request", 400
+
+    if not 0 < number <= MAX_NEAREST_STARS:
+        return jsonify({"error": ERROR_IS_NUMBER_OF_STARS_VALID})
+
+    if point and not is_points_range_valid([point]):
+        return jsonify({"error": ERROR_IS_POINTS_RANGE_VALID})
+
+    star_index: StarIndex = get_star_index()
+    index_of_star: Optional[int] = None
+    position: Any
+    if star_id is not None:
+        index_of_star = star_index.indexes.get(star_id)
+        if index_of_star is None:
+            return jsonify({"error": ERROR_STAR_DOES_NOT_EXIST})
+        position = star_index.space_tree.points[index_of_star]
+    else:
+        position = to_unit_vectors(point["ra"], point["dec"]) * dist
+
+    indexes, distances = star_index.nearest(
+        position, number + (index_of_star is not None), radius
+    )
+    return jsonify(
+        [
+            {**star_index.stars[index], "distance": float(distance)}
+            for index, distance in zip(indexes, distances)
+            if index != index_of_star
+        ][:number]
+    )
+
 
 @bp_views.route("/segment_search", methods=["POST"])  # type: ignore
 def segment_search() -> Any:
@@ -241,13 +596,23 @@ def segment_search() -> Any:
     except:
         return "bad request", 400
 
-    hash_: Union[str, None] = session.get("request")
+    reference: str = _session_reference()
+    state: dict[str, Any] = load_session_state(reference)
+    hash_: Optional[str] = _hash_of_request(state)
     if hash_ is None:
         return "bad request", 400
 
-    search_class: Search = Search(hash_, type_enum)
+    try:
+        search_class: Search = Search(hash_, type_enum)
+    except KeyError:
+        return "bad request", 400
 
     result = search_class.segment_search(minimum, maximum)
+    state["last_search"] = {
+        **state.get("last_search", {}),
+        hash_ + ":" + type_enum.value: search_class.last_search,
+    }
+    save_session_state(reference, state)
 
     return jsonify(result)
 
@@ -255,20 +620,80 @@ def segment_search() -> Any:
 @bp_views.route("/sort_search", methods=["POST"])  # type: ignore
 def sort_search() -> Any:
     type_ = request.json["type"]
-    page = request.json["page"]
     descending = request.json["descending"]
+    cursor: Any = request.json.get("cursor")
 
     try:
         type_enum = TypeSearch(type_)
+        size: int = int(request.json.get("size", PAGINATION_SIZE))
     except:
         return "bad request", 400
 
-    hash_ = session.get("request")
+    if not 0 < size <= MAX_PAGINATION_SIZE:
+        return "bad request", 400
+    if cursor is not None and not isinstance(cursor, str):
+        return "bad request", 400
+
+    state = load_session_state(_session_reference())
+    hash_ = _hash_of_request(state)
     if hash_ is None:
         return "bad request", 400
 
-    search_class = Search(hash_, type_enum)
+    try:
+        search_class = Search(hash_, type_enum)
+    except KeyError:
+        return "bad request", 400
 
-    result = search_class.sort_search(page=page, descending=bool(int(descending)))
+    search_class.last_search = state.get("last_search", {}).get(
+        hash_ + ":" + type_enum.value, {}
+    )
+    if "cursor" in request.json:
+        try:
+            return jsonify(
+                search_class.cursor_search(
+                    cursor=cursor, descending=bool(int(descending)), size=size
+                )
+            )
+        except ValueError:
+            return "bad request", 400
+
+    result = search_class.sort_search(
+        page=request.json["page"], descending=bool(int(descending)), size=size
+    )
+
+    return jsonify(result)
+
+
+@bp_views.route("/filter_search", methods=["POST"])  # type: ignore
+def filter_search() -> Any:
+    data: Any = request.json
+    try:
+        type_enum: TypeSearch = TypeSearch(data["type"])
+        page: int = int(data["page"])
+        descending: bool = bool(int(data.get("descending", 0)))
+        ranges: dict[TypeSearch, tuple[float, float]] = {
+            TypeSearch(type_): (
+                -math.inf
+                if range_.get("minimum") is None
+                else float(range_["minimum"]),
+                math.inf if range_.get("maximum") is None else float(range_["maximum"]),
+            )
+            for type_, range_ in data["filters"].items()
+        }
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return "bad request", 400
+
+    if page < 1:
+        return "bad request", 400
+
+    hash_: Optional[str] = _hash_of_request()
+    if hash_ is None:
+        return "bad request", 400
+
+    try:
+        search_class: Search = Search(hash_, type_enum)
+        result = search_class.filter_search(ranges, page, descending)
+    except KeyError:
+        return "bad request", 400
 
     return jsonify(result)
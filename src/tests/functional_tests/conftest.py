@@ -6,7 +6,9 @@ from selenium.webdriver.firefox.options import Options
 from werkzeug.serving import make_server
 
 from starapp import create_app
+from starapp.algorithms import _redis_client, _registered_script
 from starapp.constants import PORT, SERVER
+from starapp.spatial import _load_star_index
 
 from models import db  # isort:skip
 
@@ -31,4 +33,7 @@ def browser() -> webdriver.Firefox:
 
     with app.app_context():
         db.session.remove()
+        _load_star_index.cache_clear()
+        _redis_client.cache_clear()
+        _registered_script.cache_clear()
         db.drop_all()
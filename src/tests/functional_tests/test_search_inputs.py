@@ -1,12 +1,12 @@
+from functools import partial
 from typing import Any
 from unittest.mock import patch
 
 import pytest
-from fakeredis import FakeStrictRedis
+from fakeredis import FakeServer, FakeStrictRedis
 from selenium import webdriver
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
-from sqlalchemy import text
 
 from models import db
 from starapp.constants import (
@@ -39,7 +39,10 @@ def check_fields_search_statistics(
             assert percentage == str(testing_percentage) + "%"
 
 
-@patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
+@patch(
+    "starapp.algorithms.redis.StrictRedis",
+    partial(FakeStrictRedis, server=FakeServer()),
+)
 class TestInputs:
     def test_change(self, browser: webdriver.Firefox) -> None:
         CONSTELLATION_SEARCH_TITLE = "Search with constellation:"
@@ -98,15 +101,6 @@ class TestInputs:
         create_data_for_test()
         tag = JsonData.constellation["tag"]
         testing_data = JsonData.get_data_from_constellation_frontend
-        db.session.execute(
-            text(
-                f"""
-            CREATE VIEW stars_with_{tag} AS
-                SELECT * FROM star WHERE con='{tag}';
-        """
-            )
-        )
-        db.session.commit()
 
         browser.get(LIVE_SERVER_URL)
         get_element_by_id("constellation_input", browser).send_keys(tag)
@@ -127,15 +121,6 @@ class TestInputs:
 
         check_fields_search_statistics(testing_data, browser)
 
-        db.session.execute(
-            text(
-                f"""
-            DROP VIEW stars_with_{tag};
-        """
-            )
-        )
-        db.session.commit()
-
     def test_input_points(self, browser: webdriver.Firefox) -> None:
         create_data_for_test()
         browser.get(LIVE_SERVER_URL)
@@ -1,7 +1,8 @@
 import time
+from functools import partial
 from unittest.mock import patch
 
-from fakeredis import FakeStrictRedis
+from fakeredis import FakeServer, FakeStrictRedis
 from selenium import webdriver
 from selenium.webdriver.common.keys import Keys
 
@@ -14,7 +15,10 @@ from tests.helpers import (
 )
 
 
-@patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
+@patch(
+    "starapp.algorithms.redis.StrictRedis",
+    partial(FakeStrictRedis, server=FakeServer()),
+)
 class TestSearchSegment:
     def test_search(self, browser: webdriver.Firefox) -> None:
         create_data_for_test()
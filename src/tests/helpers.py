@@ -13,6 +13,7 @@ from starapp.constants import (
     CONSTELLATION,
     DEC,
     INT_CATALOGS,
+    NAME,
     OTHER_DATA,
     RA,
     SERVER_URL,
@@ -90,6 +91,7 @@ def create_data_for_test() -> None:
                 "id": data_for_test["id"][index],
                 "spect": data_for_test[SPECT][index],
                 "con": data_for_test[CONSTELLATION][index],
+                NAME: data_for_test[NAME][index],
                 **{key: data_for_test[key][index] for key in OTHER_DATA},
                 "ra": data_for_test[RA][index],
                 "dec": data_for_test[DEC][index],
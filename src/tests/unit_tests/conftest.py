@@ -4,6 +4,8 @@ from flask.testing import FlaskClient, FlaskCliRunner
 
 from models import db
 from starapp import create_app
+from starapp.algorithms import _redis_client, _registered_script
+from starapp.spatial import _load_star_index
 
 
 @pytest.fixture()  # type: ignore
@@ -14,7 +16,11 @@ def testing_app() -> Flask:
 
     with app.app_context():
         db.session.remove()
+        _load_star_index.cache_clear()
+        _redis_client.cache_clear()
+        _registered_script.cache_clear()
         db.drop_all()
+        db.engine.dispose()
 
 
 @pytest.fixture()  # type: ignore
@@ -1,12 +1,35 @@
+import bisect
 import math
-from typing import Optional
+import random
+from functools import partial
+from typing import Any, Optional
 from unittest.mock import Mock, patch
 
-from fakeredis import FakeStrictRedis
+import pytest
+from fakeredis import FakeServer, FakeStrictRedis
 from flask.testing import FlaskClient
+from redis.connection import Connection
 
 from models import CatalogAssociation, Star
-from starapp.algorithms import MetaSearch, Search, TypeSearch, get_value
+from starapp.algorithms import (
+    STORAGES,
+    MetaSearch,
+    NumpyStorage,
+    PolygonCache,
+    RedisStorage,
+    Search,
+    TypeSearch,
+    get_value,
+    load_session_state,
+    save_session_state,
+)
+from starapp.constants import (
+    CONSTELLATION_HASH_PREFIX,
+    PAGINATION_SIZE,
+    POLYGON_HASH_PREFIX,
+    SEARCH_TTL,
+    SESSION_STATE_PREFIX,
+)
 from tests.helpers import (
     JsonData,
     create_catalog_association_for_test,
@@ -16,6 +39,20 @@ from tests.helpers import (
 )
 
 
+def _redis_of_search(search: Search) -> Any:
+    assert isinstance(search.storage, RedisStorage)
+    return search.storage.redis_
+
+
+def _bisect_segment(
+    values: list[float], minimum: float, maximum: float
+) -> tuple[int, int]:
+    """Indexes of the segment found by the Python bisection search that ran
+    before the Lua scripts.
+    """
+    return bisect.bisect_left(values, minimum), bisect.bisect_right(values, maximum) - 1
+
+
 @patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
 class TestSearch:
     hash_: str = "example_hash"
@@ -27,62 +64,169 @@ class TestSearch:
             stars=[vars(star) for star in Star.query.all()],
         )
 
-    @patch("starapp.algorithms.Search.return_name_of_star")
-    def test__init__(self, mock_return_name_of_star: Mock, client: FlaskClient) -> None:
+    def test__init__(self, client: FlaskClient) -> None:
         result = JsonData.search_dist
-        mock_return_name_of_star.side_effect = [data["name"] for data in result]
         create_data_for_test()
         search = self._return_search()
-        testing_array = search.redis_.lrange(self.hash_ + ":dist", 0, len(result))
+        testing_array = _redis_of_search(search).zrange(
+            self.hash_ + ":dist", 0, -1, withscores=True
+        )
 
-        assert testing_array != []
+        ids_of_names = dict(
+            zip(JsonData.data_after_api["name"], JsonData.data_after_api["id"])
+        )
+        assert testing_array == [
+            (
+                f"{index:010d}:{ids_of_names[data['name']]:010d}:{data['name']}",
+                data["value"],
+            )
+            for index, data in enumerate(result)
+        ]
 
-        for hash_data, result in zip(testing_array, result):
-            testing_dict = search.redis_.hgetall(hash_data)
-            assert {
-                "name": testing_dict["name"],
-                "value": float(testing_dict["value"]),
-            } == result
+        Search.clear(hash_=self.hash_)
 
+    @patch("starapp.algorithms.REDIS_CHUNK_SIZE", 3)
+    def test__init__with_one_round_trip(self, client: FlaskClient) -> None:
+        stars = [
+            {"id": index, "name": str(index), "dist": float(index)}
+            for index in range(10)
+        ]
+        round_trips: list[bytes] = []
+        send_packed_command = Connection.send_packed_command
+
+        def count_round_trips(
+            connection: Connection, *args: Any, **kwargs: Any
+        ) -> None:
+            round_trips.append(args[0])
+            send_packed_command(connection, *args, **kwargs)
+
+        with patch.object(Connection, "send_packed_command", count_round_trips):
+            search = Search(self.hash_, TypeSearch.DISTANCE, stars=stars)
+
+        assert len(round_trips) == 1
+        assert _redis_of_search(search).zcard(self.hash_ + ":dist") == len(stars)
         Search.clear(hash_=self.hash_)
 
-    def test__del__(self, client: FlaskClient) -> None:
-        delete_hash = "delete_hash"
+    def test_shared_search(self, client: FlaskClient) -> None:
         create_data_for_test()
-        search = self._return_search(hash_=delete_hash)
-        length = search.length
-        redis_ = search.redis_
-        search.__del__()
-        testing_data = JsonData.search_dist
+        stars = [vars(star) for star in Star.query.all()]
+        hash_: str = CONSTELLATION_HASH_PREFIX + "cra"
+        server = FakeServer()
+
+        with patch(
+            "starapp.algorithms.redis.StrictRedis",
+            partial(FakeStrictRedis, server=server),
+        ):
+            search = Search(hash_, TypeSearch.DISTANCE, stars=stars)
+            result = search.segment_search(minimum=0, maximum=200)
+            Search.clear(hash_=hash_)
+            del search
 
-        for dict_ in testing_data:
-            data_hash = redis_.hgetall(delete_hash + ":dist:" + dict_["name"])
-            assert data_hash == {}
+            search = Search(hash_, TypeSearch.DISTANCE)
+            assert search.length == len(stars)
+            assert search.segment_search(minimum=0, maximum=200) == result
 
-        assert redis_.lrange(delete_hash + ":dist", 0, length) == []
+            Search.clear(hash_=hash_)
+            assert FakeStrictRedis(server=server).keys() == [(hash_ + ":dist").encode()]
 
-    def test_return_name_of_star(self, client: FlaskClient) -> None:
+    def test_rebuild_shared_search(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        stars = [vars(star) for star in Star.query.all()]
+        hash_: str = CONSTELLATION_HASH_PREFIX + "cra"
+        server = FakeServer()
+
+        with patch(
+            "starapp.algorithms.redis.StrictRedis",
+            partial(FakeStrictRedis, server=server),
+        ):
+            Search(hash_, TypeSearch.DISTANCE, stars=stars)
+            Search.clear(hash_=hash_)
+            assert Search(hash_, TypeSearch.DISTANCE, stars=stars[:2]).length == len(
+                stars
+            )
+            Search.clear(hash_=hash_)
+
+            search = Search(hash_, TypeSearch.DISTANCE, stars=stars[:2], rebuild=True)
+            assert search.length == len(search.storage) == 2
+            assert FakeStrictRedis(server=server).keys() == [(hash_ + ":dist").encode()]
+            Search.clear(hash_=hash_)
+
+            Search(hash_, TypeSearch.DISTANCE, stars=[], rebuild=True)
+            assert FakeStrictRedis(server=server).keys() == []
+            Search.clear(hash_=hash_)
+
+    def test_clear(self, client: FlaskClient) -> None:
+        delete_hash = "delete_hash"
+        create_data_for_test()
+        server = FakeServer()
+        with patch(
+            "starapp.algorithms.redis.StrictRedis",
+            partial(FakeStrictRedis, server=server),
+        ):
+            search = self._return_search(hash_=delete_hash)
+            length = search.length
+            Search.clear(hash_=delete_hash)
+
+        assert FakeStrictRedis(server=server).exists(delete_hash + ":dist") == 0
+        assert length == len(JsonData.search_dist)
+
+    @patch("starapp.algorithms.SEARCH_TTL", 100)
+    def test_ttl(self, client: FlaskClient) -> None:
         create_data_for_test()
         search = self._return_search()
-        for id, result in zip(
-            JsonData.data_after_api["id"], JsonData.return_name_of_star
+        redis_ = _redis_of_search(search)
+        name = self.hash_ + ":dist"
+
+        assert 0 < redis_.ttl(name) <= 100
+        redis_.expire(name, 10)
+        search.segment_search(minimum=0, maximum=200)
+        assert redis_.ttl(name) > 10
+        redis_.expire(name, 10)
+        search.sort_search(page=1)
+        assert redis_.ttl(name) > 10
+        Search.clear(hash_=self.hash_)
+
+    def test_attach(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        server = FakeServer()
+        with patch(
+            "starapp.algorithms.redis.StrictRedis",
+            partial(FakeStrictRedis, server=server),
         ):
-            assert search.return_name_of_star(id) == result
+            search = self._return_search()
+            result = search.segment_search(minimum=0, maximum=200)
+            MetaSearch.clear(Search, self.hash_)
+
+            attached = Search(self.hash_, TypeSearch.DISTANCE)
+            assert attached is not search
+            assert attached.length == search.length
+            assert attached.segment_search(minimum=0, maximum=200) == result
+
+            Search.clear(hash_=self.hash_)
+            try:
+                Search(self.hash_, TypeSearch.DISTANCE)
+            except KeyError:
+                pass
+            else:
+                assert False, "Search must not attach to a deleted selection"
 
     def test_get_value(self, client: FlaskClient) -> None:
         create_data_for_test()
         search = self._return_search()
         testing_data = JsonData.search_dist
 
-        for dict_ in testing_data:
-            data_hash = search.redis_.hset(
-                self.hash_ + ":dist:" + dict_["name"], mapping=dict_
+        _redis_of_search(search).delete(self.hash_ + ":dist")
+        for index, dict_ in enumerate(testing_data):
+            _redis_of_search(search).zadd(
+                self.hash_ + ":dist",
+                {f"{index:010d}:{index:010d}:{dict_['name']}": dict_["value"]},
             )
-            search.redis_.rpush(self.hash_ + ":dist", data_hash)
 
         for index, result in enumerate(testing_data, start=0):
             assert (
-                get_value(search.redis_, self.hash_, TypeSearch.DISTANCE, index)
+                get_value(
+                    _redis_of_search(search), self.hash_, TypeSearch.DISTANCE, index
+                )
                 == result
             )
         Search.clear(hash_=self.hash_)
@@ -133,6 +277,255 @@ class TestSearch:
             )
         Search.clear(hash_=self.hash_)
 
+    def test_segment_search_with_equal_values(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        stars = [vars(star) for star in Star.query.all()]
+        for star in stars:
+            star["dist"] = 10
+
+        search = Search(hash_=self.hash_, type_search=TypeSearch("dist"), stars=stars)
+        result = search.segment_search(minimum=10, maximum=10)
+
+        assert result["sum"] == len(stars)
+        assert search.last_search == {"min_index": 0, "max_index": len(stars) - 1}
+        assert (
+            search.sort_search(page=1)
+            == [{"name": star["name"], "value": 10} for star in stars][:PAGINATION_SIZE]
+        )
+        Search.clear(hash_=self.hash_)
+
+    def test_scripts_parity_with_numpy_storage(self, client: FlaskClient) -> None:
+        random.seed(0)
+        stars = sorted(
+            (
+                (
+                    index,
+                    None if index % 7 == 0 else f"HIP {index}",
+                    float(random.randint(0, 20)),
+                )
+                for index in range(500)
+            ),
+            key=lambda star: star[2],
+        )
+        redis_storage = RedisStorage("parity", stars)
+        numpy_storage = NumpyStorage("parity", stars)
+
+        for minimum, maximum in ((-1, 30), (5, 5), (4.5, 12), (7, 6), (21, 25)):
+            assert redis_storage.segment(minimum, maximum) == numpy_storage.segment(
+                minimum, maximum
+            )
+
+        for start_index, end_index in ((0, 0), (0, 499), (37, 112), (490, 499)):
+            for descending in (False, True):
+                assert redis_storage.page(
+                    start_index, end_index, descending
+                ) == numpy_storage.page(start_index, end_index, descending)
+        redis_storage.delete()
+
+    @pytest.mark.parametrize("storage", list(STORAGES))
+    def test_parity_with_bisection(self, storage: str, client: FlaskClient) -> None:
+        random.seed(2)
+        stars: list[dict[str, Any]] = [
+            {
+                "id": index,
+                "name": None if index % 5 == 0 else f"HIP {index}",
+                "dist": float(random.randint(0, 8)),
+            }
+            for index in range(400)
+        ]
+        sorted_stars = sorted(stars, key=lambda star: star["dist"])
+        values = [star["dist"] for star in sorted_stars]
+        bounds = sorted(set(values)) + [-1.0, 0.5, 3.5, 9.0]
+        size = 7
+
+        with patch("starapp.algorithms.SEARCH_STORAGE", storage):
+            search = Search(self.hash_, TypeSearch.DISTANCE, stars=stars)
+            for minimum in bounds:
+                for maximum in bounds:
+                    min_index, max_index = _bisect_segment(values, minimum, maximum)
+                    result = search.segment_search(minimum, maximum)
+                    if min_index > max_index:
+                        assert result == {"minimum": "-", "maximum": "-", "sum": "-"}
+                        assert search.sort_search(page=1) == []
+                        continue
+
+                    segment = [
+                        {"name": star["name"], "value": star["dist"]}
+                        for star in sorted_stars[min_index : max_index + 1]
+                    ]
+                    assert result == {
+                        "minimum": segment[0],
+                        "maximum": segment[-1],
+                        "sum": len(segment),
+                    }
+                    assert search.last_search == {
+                        "min_index": min_index,
+                        "max_index": max_index,
+                    }
+                    for descending in (False, True):
+                        expected = segment[::-1] if descending else segment
+                        for page in (1, 2, math.ceil(len(segment) / size) + 1):
+                            assert (
+                                search.sort_search(page, descending, size)
+                                == expected[(page - 1) * size : page * size]
+                            )
+            Search.clear(hash_=self.hash_)
+
+    @pytest.mark.parametrize("storage", list(STORAGES))
+    def test_filter_search(self, storage: str, client: FlaskClient) -> None:
+        random.seed(1)
+        stars: list[dict[str, Any]] = [
+            {
+                "id": index,
+                "name": f"HIP {index}",
+                **{
+                    type_search.value: float(random.randint(0, 20))
+                    for type_search in TypeSearch
+                },
+            }
+            for index in range(300)
+        ]
+        ranges = {
+            TypeSearch.APPARENT_MAGNITUDE: (2.0, 16.0),
+            TypeSearch.DISTANCE: (-math.inf, 15.0),
+            TypeSearch.ABSOLUTE_MAGNITUDE: (3.0, math.inf),
+        }
+        inside = [
+            star
+            for star in stars
+            if all(
+                minimum <= star[type_search.value] <= maximum
+                for type_search, (minimum, maximum) in ranges.items()
+            )
+        ]
+
+        server = FakeServer()
+        with patch("starapp.algorithms.SEARCH_STORAGE", storage), patch(
+            "starapp.algorithms.redis.StrictRedis",
+            partial(FakeStrictRedis, server=server),
+        ):
+            for type_search in TypeSearch:
+                Search(self.hash_, type_search, stars=stars)
+
+            for type_search, descending in (
+                (TypeSearch.DISTANCE, False),
+                (TypeSearch.APPARENT_MAGNITUDE, True),
+            ):
+                expected = sorted(inside, key=lambda star: star[type_search.value])
+                if descending:
+                    expected.reverse()
+                search = Search(self.hash_, type_search)
+                for page in (1, 2):
+                    assert search.filter_search(ranges, page, descending) == {
+                        "sum": len(inside),
+                        "stars": [
+                            {"name": star["name"], "value": star[type_search.value]}
+                            for star in expected[
+                                (page - 1) * PAGINATION_SIZE : page * PAGINATION_SIZE
+                            ]
+                        ],
+                    }
+
+            search = Search(self.hash_, TypeSearch.DISTANCE)
+            assert search.filter_search({TypeSearch.DISTANCE: (5.0, 4.0)}, 1) == {
+                "sum": 0,
+                "stars": [],
+            }
+            if storage == "redis":
+                redis_ = FakeStrictRedis(server=server)
+                filters = redis_.keys(self.hash_ + ":*:filter:*")
+                assert len(filters) == 5
+                assert all(0 < redis_.ttl(name) <= SEARCH_TTL for name in filters)
+            Search.clear(hash_=self.hash_)
+
+    def test_sort_search(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        search = self._return_search()
+        for testing_data, testing_result in zip(
+            JsonData.sort_search, JsonData.algorithms_search_sort_result
+        ):
+            search.last_search = testing_data["last_search"]
+
+            result = search.sort_search(
+                page=testing_data["input"]["page"],
+                descending=testing_data["input"]["descending"],
+            )
+
+            assert result == testing_result
+        Search.clear(hash_=self.hash_)
+
+    def test_cursor_search(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        search = self._return_search()
+        search.segment_search(minimum=20, maximum=250)
+        min_index, max_index = (
+            search.last_search["min_index"],
+            search.last_search["max_index"],
+        )
+        segment = search.storage.page(min_index, max_index)
+
+        for descending in (False, True):
+            for size in (1, 3, 100):
+                stars: list[Any] = []
+                cursors: list[Optional[str]] = []
+                result: dict[str, Any] = search.cursor_search(
+                    descending=descending, size=size
+                )
+                while True:
+                    assert 0 < len(result["stars"]) <= size
+                    stars.extend(result["stars"])
+                    cursors.append(result["cursor"])
+                    if result["cursor"] is None:
+                        break
+                    result = search.cursor_search(cursor=result["cursor"], size=size)
+
+                assert stars == (segment[::-1] if descending else segment)
+                assert len(cursors) == math.ceil(len(segment) / size)
+                assert search.sort_search(1, descending, size) == stars[:size]
+
+        search.last_search = {}
+        assert search.cursor_search() == {"stars": [], "cursor": None}
+        Search.clear(hash_=self.hash_)
+
+
+@patch("starapp.algorithms.SEARCH_STORAGE", "numpy")
+class TestSearchWithNumpyStorage:
+    hash_: str = "example_hash"
+
+    def _return_search(self) -> Search:
+        return Search(
+            hash_=self.hash_,
+            type_search=TypeSearch("dist"),
+            stars=[vars(star) for star in Star.query.all()],
+        )
+
+    def test__init__(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        search = self._return_search()
+
+        assert isinstance(search.storage, NumpyStorage)
+        assert search.storage.page(0, search.length - 1) == JsonData.search_dist
+        Search.clear(hash_=self.hash_)
+
+    def test_binary_search(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        search = self._return_search()
+
+        for testing_data in JsonData.binary_search:
+            result = search.binary_search(**testing_data["input"])
+            assert list(result) == testing_data["result"]
+        Search.clear(hash_=self.hash_)
+
+    def test_segment_search(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        search = self._return_search()
+
+        for testing_data in JsonData.segment_search:
+            assert (
+                search.segment_search(**testing_data["input"]) == testing_data["result"]
+            )
+        Search.clear(hash_=self.hash_)
+
     def test_sort_search(self, client: FlaskClient) -> None:
         create_data_for_test()
         search = self._return_search()
@@ -150,6 +543,111 @@ class TestSearch:
         Search.clear(hash_=self.hash_)
 
 
+class TestRedisClient:
+    def test_shared_client(self, client: FlaskClient) -> None:
+        with patch(
+            "starapp.algorithms.redis.StrictRedis",
+            Mock(side_effect=partial(FakeStrictRedis, server=FakeServer())),
+        ) as mock_redis:
+            first_storage = RedisStorage("first", [(1, "HIP 1", 1.0)])
+            second_storage = RedisStorage("second")
+            polygon_cache = PolygonCache()
+
+            assert mock_redis.call_count == 1
+            assert first_storage.redis_ is second_storage.redis_
+            assert polygon_cache.redis_ is first_storage.redis_
+            assert first_storage.page_script is second_storage.page_script
+            assert len(second_storage.redis_.keys()) == 1
+            first_storage.delete()
+
+
+class TestPolygonCache:
+    def test_eviction(self, client: FlaskClient) -> None:
+        redis_ = FakeStrictRedis(server=FakeServer(), decode_responses=True)
+        with patch("starapp.algorithms.redis.StrictRedis", lambda **kwargs: redis_):
+            polygon_cache = PolygonCache(size=2)
+            hashes = [POLYGON_HASH_PREFIX + str(index) for index in range(5)]
+            for hash_ in hashes:
+                for type_search in TypeSearch:
+                    redis_.zadd(hash_ + ":" + type_search.value, {"member": 1})
+
+            polygon_cache.put(hashes[0], {"number_of_stars": 0}, "first")
+            polygon_cache.put(hashes[1], {"number_of_stars": 1}, "second")
+            polygon_cache.release(hashes[1], "second")
+            polygon_cache.put(hashes[2], {"number_of_stars": 2}, "second")
+
+            assert polygon_cache.get(hashes[0], "first") == {"number_of_stars": 0}
+            assert polygon_cache.get(hashes[1], "first") is None
+            assert redis_.exists(hashes[1] + ":dist") == 0
+
+            # The session of "first" is abandoned: its reference expires.
+            redis_.zadd(hashes[0] + ":references", {"first": 0})
+            polygon_cache.put(hashes[3], {"number_of_stars": 3}, "third")
+            assert polygon_cache.get(hashes[0], "third") is None
+            assert polygon_cache.get(hashes[2], "second") == {"number_of_stars": 2}
+            assert polygon_cache.get(hashes[3], "third") == {"number_of_stars": 3}
+
+            redis_.delete(hashes[2] + ":statistics")
+            polygon_cache.put(hashes[4], {"number_of_stars": 4}, "third")
+            assert redis_.zrange(PolygonCache.RECENT, 0, -1) == hashes[3:]
+            assert redis_.exists(hashes[2] + ":dist") == 1
+
+    def test_get_refreshes_reference(self, client: FlaskClient) -> None:
+        redis_ = FakeStrictRedis(server=FakeServer(), decode_responses=True)
+        with patch("starapp.algorithms.redis.StrictRedis", lambda **kwargs: redis_):
+            polygon_cache = PolygonCache(size=1)
+            hash_ = POLYGON_HASH_PREFIX + "0"
+            for type_search in TypeSearch:
+                redis_.zadd(hash_ + ":" + type_search.value, {"member": 1})
+
+            polygon_cache.put(hash_, {"number_of_stars": 0}, "first")
+            redis_.zadd(hash_ + ":references", {"first": 0})
+            assert polygon_cache.get(hash_, "second") == {"number_of_stars": 0}
+            assert redis_.zrangebyscore(hash_ + ":references", 1, "+inf") == ["second"]
+            assert 0 < redis_.ttl(hash_ + ":references") <= SEARCH_TTL
+
+
+@patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
+class TestSessionState:
+    @pytest.mark.parametrize("storage", list(STORAGES))
+    def test_save_and_load(self, storage: str, client: FlaskClient) -> None:
+        with patch("starapp.algorithms.SEARCH_STORAGE", storage):
+            state = {"batch": ["first_hash"], "last_search": {"first_hash:dist": {}}}
+            assert load_session_state("reference") == {}
+
+            save_session_state("reference", state)
+            assert load_session_state("reference") == state
+            assert load_session_state("other_reference") == {}
+
+            save_session_state("reference", {})
+            assert load_session_state("reference") == {}
+
+    def test_redis_ttl(self, client: FlaskClient) -> None:
+        save_session_state("reference", {"batch": ["first_hash"]})
+        redis_ = RedisStorage("unused").redis_
+        redis_.expire(SESSION_STATE_PREFIX + "reference", 10)
+
+        load_session_state("reference")
+        assert 10 < redis_.ttl(SESSION_STATE_PREFIX + "reference") <= SEARCH_TTL
+        save_session_state("reference", {})
+        assert redis_.exists(SESSION_STATE_PREFIX + "reference") == 0
+
+    @patch("starapp.algorithms.SEARCH_TTL", 100)
+    def test_numpy_expiry(self, client: FlaskClient) -> None:
+        with patch("starapp.algorithms.time.monotonic") as mock_monotonic:
+            mock_monotonic.return_value = 1000
+            NumpyStorage.save_state("first", {"batch": ["first_hash"]})
+            NumpyStorage.save_state("second", {"batch": ["second_hash"]})
+
+            mock_monotonic.return_value = 1090
+            assert NumpyStorage.load_state("first") == {"batch": ["first_hash"]}
+
+            mock_monotonic.return_value = 1150
+            assert NumpyStorage.load_state("first") == {"batch": ["first_hash"]}
+            assert "second" not in NumpyStorage.states
+            NumpyStorage.save_state("first", {})
+
+
 class TestSearchMeta:
     def test__call__(self, client: FlaskClient) -> None:
         class ExampleClass(metaclass=MetaSearch):
@@ -193,3 +691,27 @@ class TestSearchMeta:
         )
         ExampleClass.clear(hash_=random_hash)
         del ExampleClass
+
+    @patch("starapp.algorithms.SEARCH_TTL", 100)
+    def test_expiry(self, client: FlaskClient) -> None:
+        class ExampleClass(metaclass=MetaSearch):
+            def __init__(self, hash_: str, type_search: TypeSearch):
+                self.hash_ = hash_
+                self.type_search = type_search
+
+        with patch("starapp.algorithms.time.monotonic") as mock_monotonic:
+            mock_monotonic.return_value = 1000
+            first_class = ExampleClass("first_hash", TypeSearch.DISTANCE)
+            second_class = ExampleClass("second_hash", TypeSearch.DISTANCE)
+
+            mock_monotonic.return_value = 1090
+            assert ExampleClass("first_hash", TypeSearch.DISTANCE) is first_class
+
+            mock_monotonic.return_value = 1150
+            assert ExampleClass("first_hash", TypeSearch.DISTANCE) is first_class
+            assert "second_hash:dist" not in MetaSearch._instances
+            assert ExampleClass("second_hash", TypeSearch.DISTANCE) is not second_class
+
+        ExampleClass.clear(hash_="first_hash")
+        ExampleClass.clear(hash_="second_hash")
+        del ExampleClass
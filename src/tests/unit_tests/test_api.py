@@ -1,26 +1,30 @@
-from collections.abc import Iterable
-from typing import Any, Callable
+from typing import Any
 from unittest.mock import Mock, call, patch
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+from fakeredis import FakeServer, FakeStrictRedis
 from flask.testing import FlaskClient, FlaskCliRunner
-from sqlalchemy import text
 
-from models import Catalog, CatalogAssociation, Constellation, Star, db
+from models import Catalog, CatalogAssociation, Constellation, Source, Star, db
 from starapp.api import *
 from starapp.constants import (
     CATALOGS,
     CONSTELLATION,
     DEC,
+    INPUT_COLUMNS,
     INT_CATALOGS,
     LIST_OF_CONSTELLATIONS,
+    NAME,
     OTHER_DATA,
     PATH_TO_HYGDATA_V3,
     RA,
     SPECT,
     STR_CATALOGS,
 )
+from starapp.spatial import get_star_index
+from starapp.views import get_constellation_hash_prefix
 from tests.helpers import (
     JsonData,
     check_model_fields,
@@ -38,6 +42,7 @@ class TestAddStar:
         for field in OTHER_DATA + (RA, DEC):
             data_about_star[field] = hygdata[field][index]
         data_about_star[SPECT] = hygdata[SPECT][index]
+        data_about_star[NAME] = hygdata[NAME][index]
         data_about_star[CONSTELLATION] = (
             hygdata[CONSTELLATION][index] if need_constellation else None
         )
@@ -54,163 +59,113 @@ class TestAddStar:
         assert (
             "Information about stars have successfully downloaded!\n" in result.output
         )
-        mock_get_api.assert_called_once()
+        mock_get_api.assert_called_once_with(False, PATH_TO_HYGDATA_V3)
+
+        runner.invoke(download_stars, ["--incremental", "--path", "stars.parquet"])
+        mock_get_api.assert_called_with(True, "stars.parquet")
+
+    @patch("starapp.api.create_constellation_search")
+    def test_build_constellation_indexes(
+        self,
+        mock_create_constellation_search: Mock,
+        runner: FlaskCliRunner,
+    ) -> None:
+        result = runner.invoke(build_constellation_indexes)
+
+        assert "Indexes for constellations have successfully built!\n" in result.output
+        mock_create_constellation_search.assert_has_calls(
+            [call(tag, rebuild=True) for tag in LIST_OF_CONSTELLATIONS]
+        )
 
     def test_get_spect(self, client: FlaskClient) -> None:
         data = pd.DataFrame.from_dict(JsonData.data_from_hygdata)
-        for index, spect_data in enumerate(JsonData.data_after_api["spect"], start=0):
-            assert get_spect(data.loc[index]["spect"]) == spect_data
+        spects = get_spect(data[SPECT])
+        assert spects.replace({pd.NA: None}).tolist() == JsonData.data_after_api[SPECT]
+
+        assert get_spect(pd.Series(["It's not exist!", "", np.nan])).isna().all()
+        assert get_spect(pd.Series([np.nan, np.nan])).isna().all()
+
+    def test_get_name(self, client: FlaskClient) -> None:
+        data = pd.DataFrame.from_dict(JsonData.data_from_hygdata)
+        assert get_name(data).tolist() == JsonData.data_after_api[NAME]
 
-        assert get_spect("It's not exist!") == None
+        empty = pd.DataFrame({tag: [np.nan] for tag in CATALOGS})
+        assert get_name(empty).isna().all()
 
-    @patch("starapp.api.Manager")
-    @patch("starapp.api.Pool")
+    @patch("starapp.api.INGEST_CHUNK_SIZE", 4)
+    def test_read_chunks(self, client: FlaskClient, tmp_path: Any) -> None:
+        hygdata = pd.DataFrame.from_dict(JsonData.data_from_hygdata)
+        table = pa.Table.from_pandas(hygdata, preserve_index=False)
+        paths: dict[str, str] = {
+            extension: str(tmp_path / f"hygdata_v3.{extension}")
+            for extension in ("csv", "parquet", "arrow", "arrows")
+        }
+        hygdata.to_csv(paths["csv"], index=False)
+        hygdata.to_parquet(paths["parquet"], index=False, row_group_size=5)
+        with pa.ipc.new_file(paths["arrow"], table.schema) as writer:
+            writer.write_table(table, max_chunksize=5)
+        with pa.ipc.new_stream(paths["arrows"], table.schema) as writer:
+            writer.write_table(table, max_chunksize=5)
+
+        expected = get_stars(hygdata).replace({np.nan: None, pd.NA: None})
+        for extension, path in paths.items():
+            chunks = list(read_chunks(path))
+            assert all(len(chunk) <= 4 for chunk in chunks), extension
+            assert all(set(chunk.columns) == set(INPUT_COLUMNS) for chunk in chunks)
+
+            data = pd.concat(chunks, ignore_index=True)
+            stars = get_stars(data).replace({np.nan: None, pd.NA: None})
+            assert stars.to_dict("records") == expected.to_dict("records"), extension
+            assert sorted(
+                get_catalog_associations(data).itertuples(index=False, name=None)
+            ) == sorted(
+                get_catalog_associations(hygdata).itertuples(index=False, name=None)
+            )
+
+    @patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
+    @patch("starapp.api.INGEST_CHUNK_SIZE", 4)
     @patch("starapp.api.click.echo")
-    @patch("starapp.api.click.progressbar")
-    @patch("starapp.api.add_star")
     @patch("starapp.api.create_constellations")
     @patch("starapp.api.create_catalogs")
-    @patch("starapp.api.pd.read_csv")
     def test_get_api(
         self,
-        mock_read_csv: Mock,
         mock_create_catalogs: Mock,
         mock_create_constellations: Mock,
-        mock_add_star: Mock,
-        mock_progressbar: Mock,
         mock_click_echo: Mock,
-        mock_pool: Mock,
-        mock_manager: Mock,
         client: FlaskClient,
+        tmp_path: Any,
     ) -> None:
-        data_from_hygdata = JsonData.data_from_hygdata
-        testing_data = pd.DataFrame.from_dict(data_from_hygdata)
-
-        mock_progressbar.return_value.__enter__.return_value = range(len(testing_data))
-        mock_read_csv.return_value = pd.DataFrame.from_dict(testing_data)
-
-        def mock_pool_map(func: Callable[[Any], Any], iterable: Iterable[Any]) -> None:
-            for element in iterable:
-                func(element)
-
-        mock_pool.return_value.__enter__.return_value.map = mock_pool_map
+        testing_data = JsonData.data_after_api
+        path_to_hygdata = str(tmp_path / "hygdata_v3.csv")
+        pd.DataFrame.from_dict(JsonData.data_from_hygdata).to_csv(
+            path_to_hygdata, index=False
+        )
+        for constellation_tag in set(testing_data[CONSTELLATION]):
+            create_constellation_for_test(tag=constellation_tag)
         create_catalogs_for_test()
 
-        testing_data_for_catalogs = JsonData.data_after_api
-        testing_data_catalogs = []
-        testing_data_catalog_associations = dict()
-        for tag in CATALOGS:
-            catalog_associations = [
-                CatalogAssociation(
-                    **{
-                        "star_id": int(testing_data_for_catalogs["id"][index]),
-                        "identifier": str(testing_data_for_catalogs[tag][index]),
-                        "catalog_tag": tag,
-                    }
-                )
-                for index in range(len(testing_data))
-                if testing_data_for_catalogs[tag][index] is not None
-            ]
-            testing_data_catalogs.extend(catalog_associations)
-            testing_data_catalog_associations[tag] = catalog_associations
+        with patch("starapp.api.PATH_TO_HYGDATA_V3", path_to_hygdata):
+            get_api()
 
-        mock_manager.return_value.__enter__.return_value.list.side_effect = [
-            [
-                Star(
-                    **self.get_data_about_star_from_hygdata(
-                        JsonData.data_after_api, index, False
-                    )
-                )
-                for index in range(len(testing_data))
-            ],
-            testing_data_catalogs,
-        ]
-
-        get_api()
-
-        mock_read_csv.assert_called_once_with(PATH_TO_HYGDATA_V3)
         mock_create_constellations.assert_called_once()
         mock_create_catalogs.assert_called_once()
-        mock_click_echo.assert_has_calls(
-            [
-                call(f"\nStart downloading stars ({len(testing_data)})"),
-                call("\nSaving stars in the database..."),
-                call("Stars have successfully saved in the database"),
-            ]
-        )
-
-        for index in range(len(mock_add_star.call_args_list)):
-            for key in data_from_hygdata.keys():
-                assert (
-                    mock_add_star.call_args_list[index][0][2][key]
-                    == data_from_hygdata[key][index]
-                )
-
-        for catalog_model in Catalog.query.all():
-            for index, testing_data_example in enumerate(
-                catalog_model.catalog_associations, start=0
-            ):
-                catalog_association_dict = vars(testing_data_example)
-                catalog_association_dict.pop("_sa_instance_state")
-                for key in catalog_association_dict.keys():
-                    assert getattr(testing_data_example, key) == getattr(
-                        testing_data_catalog_associations[catalog_model.tag][index], key
-                    )
-
-        assert CatalogAssociation.query.count() == len(testing_data_catalogs)
-
-    @patch("starapp.api.click.echo")
-    def test_create_catalogs(self, mock_click_echo: Mock, client: FlaskClient) -> None:
-        create_catalogs()
-
-        mock_click_echo.assert_has_calls(
-            [
-                call(f"\nStart downloading catalogs"),
-                *[call(f'Added catalog with tag: "{tag}"') for tag in CATALOGS],
-                call("All catalogs have successfully saved in the database"),
-            ]
-        )
-
-        for tag in CATALOGS:
-            assert Catalog.query.filter_by(tag=tag).first() is not None
-
-    @patch("starapp.api.click.echo")
-    @patch("starapp.api.click.progressbar")
-    def test_add_star(
-        self, mock_progressbar: Mock, mock_click_echo: Mock, client: FlaskClient
-    ) -> None:
-        hygdata = pd.DataFrame.from_dict(JsonData.data_from_hygdata)
-        data = hygdata.replace(np.nan, None)
-        testing_data = JsonData.data_after_api
-
-        mock_progressbar.return_value.__enter__.return_value = [
-            con + ".txt" for con in list(testing_data[CONSTELLATION])
+        messages = [args[0] for args, _ in mock_click_echo.call_args_list]
+        assert messages[0] == "\nStart downloading stars (chunks of 4)"
+        assert [message.split(" (")[0] for message in messages[1:-1]] == [
+            "Saved 4 stars",
+            "Saved 8 stars",
+            "Saved 11 stars",
         ]
+        assert all(message.endswith(" rows/s)") for message in messages[1:-1])
+        assert messages[-1] == "Stars have successfully saved in the database"
 
-        for constellation_tag in testing_data[CONSTELLATION]:
-            create_constellation_for_test(tag=constellation_tag)
-        create_catalogs_for_test()
-
-        stars: list[Star]
-        catalog_associations: list[CatalogAssociation]
-        stars, catalog_associations = [], []
-        length_data: int = len(data)
-
-        for index in range(length_data):
-            add_star(stars, catalog_associations, data.loc[index])
-
-        db.session.bulk_save_objects(stars)
-        db.session.bulk_save_objects(catalog_associations)
-        db.session.commit()
-
-        for index in range(length_data):
+        for index, star_id in enumerate(testing_data["id"]):
             star_data = self.get_data_about_star_from_hygdata(testing_data, index)
-            star_id = int(data.loc[index]["id"])
             check_model_fields(Star.query.get(star_id), star_data)
 
         testing_catalog_associations = []
         for tag in CATALOGS:
-            for index in range(length_data):
+            for index in range(len(testing_data["id"])):
                 identifier = testing_data[tag][index]
                 if identifier is not None:
                     testing_catalog_associations.append(
@@ -229,14 +184,136 @@ class TestAddStar:
                 ).first(),
                 catalog_data,
             )
+        assert CatalogAssociation.query.count() == len(testing_catalog_associations)
+        assert Source.query.get(path_to_hygdata).fingerprint == get_file_fingerprint(
+            path_to_hygdata
+        )
 
-    @patch("starapp.api.create_views_for_constellation")
+    @patch("starapp.api.INGEST_CHUNK_SIZE", 4)
     @patch("starapp.api.click.echo")
-    def test_add_constellation(
+    def test_get_api_incremental(
         self,
         mock_click_echo: Mock,
-        mock_create_views_for_constellation: Mock,
         client: FlaskClient,
+        tmp_path: Any,
+    ) -> None:
+        path_to_hygdata = str(tmp_path / "hygdata_v3.csv")
+        hygdata = pd.DataFrame.from_dict(JsonData.data_from_hygdata)
+        hygdata.to_csv(path_to_hygdata, index=False)
+
+        redis_ = FakeStrictRedis(server=FakeServer(), decode_responses=True)
+        with patch("starapp.api.PATH_TO_HYGDATA_V3", path_to_hygdata), patch(
+            "starapp.algorithms.redis.StrictRedis", lambda **kwargs: redis_
+        ):
+            get_api()
+            get_api(incremental=True)
+            assert mock_click_echo.call_args_list[-1] == call(
+                "The file has not changed since the last download"
+            )
+            stale_name = get_constellation_hash_prefix() + "cra:dist"
+            redis_.zadd(stale_name, {"member": 1})
+            star_index = get_star_index()
+
+            changed = hygdata.drop(index=0)
+            changed.loc[1, "mag"] = 1.5
+            changed.loc[2, "hd"] = np.nan
+            changed = pd.concat(
+                [changed, hygdata.loc[[3]].assign(id=999999, hip=999999)]
+            )
+            changed.to_csv(path_to_hygdata, index=False)
+            get_api(incremental=True)
+
+            assert redis_.exists(stale_name) == 0
+            assert get_star_index() is not star_index
+            assert 999999 in get_star_index().indexes
+
+        assert (
+            call("Updated 3 stars, deleted 1 stars") in mock_click_echo.call_args_list
+        )
+        assert sorted(star.id for star in Star.query.all()) == sorted(changed["id"])
+        assert Star.query.get(int(hygdata.loc[1, "id"])).mag == 1.5
+        assert Star.query.get(999999).name == "HD 132563"
+        assert sorted(
+            (association.star_id, association.catalog_tag, association.identifier)
+            for association in CatalogAssociation.query.all()
+        ) == sorted(
+            get_catalog_associations(changed).itertuples(index=False, name=None)
+        )
+        assert Source.query.get(path_to_hygdata).fingerprint == get_file_fingerprint(
+            path_to_hygdata
+        )
+
+    @patch("starapp.api.click.echo")
+    def test_create_catalogs(self, mock_click_echo: Mock, client: FlaskClient) -> None:
+        create_catalogs()
+
+        mock_click_echo.assert_has_calls(
+            [
+                call(f"\nStart downloading catalogs"),
+                *[call(f'Added catalog with tag: "{tag}"') for tag in CATALOGS],
+                call("All catalogs have successfully saved in the database"),
+            ]
+        )
+
+        for tag in CATALOGS:
+            assert Catalog.query.filter_by(tag=tag).first() is not None
+
+    @patch("starapp.api.INGEST_CHUNK_SIZE", 4)
+    def test_get_fingerprints(self, client: FlaskClient, tmp_path: Any) -> None:
+        path = str(tmp_path / "hygdata_v3.csv")
+        data = pd.DataFrame.from_dict(JsonData.data_from_hygdata)
+        data.to_csv(path, index=False)
+        fingerprints = get_fingerprints(data, get_stars(data)).tolist()
+
+        assert [
+            fingerprint
+            for chunk in read_chunks(path)
+            for fingerprint in get_fingerprints(chunk, get_stars(chunk))
+        ] == fingerprints
+
+        converted = data.astype(
+            {"id": np.float64, "absmag": object, SPECT: "string", CONSTELLATION: object}
+        )
+        assert get_fingerprints(converted, get_stars(converted)).tolist() == (
+            fingerprints
+        )
+
+        changed = data.assign(mag=data["mag"].where(data.index != 2, 1.5))
+        assert [
+            first != second
+            for first, second in zip(
+                get_fingerprints(changed, get_stars(changed)), fingerprints
+            )
+        ] == [index == 2 for index in data.index]
+
+    def test_get_stars_and_catalog_associations(self, client: FlaskClient) -> None:
+        data = pd.DataFrame.from_dict(JsonData.data_from_hygdata)
+        testing_data = JsonData.data_after_api
+
+        stars = get_stars(data).replace({np.nan: None, pd.NA: None})
+        for index in range(len(data)):
+            assert stars.loc[index].to_dict() == self.get_data_about_star_from_hygdata(
+                testing_data, index
+            )
+
+        catalog_associations = get_catalog_associations(data)
+        assert list(catalog_associations.columns) == [
+            "star_id",
+            "catalog_tag",
+            "identifier",
+        ]
+        assert sorted(
+            catalog_associations.itertuples(index=False, name=None)
+        ) == sorted(
+            (star_id, tag, str(testing_data[tag][index]))
+            for tag in CATALOGS
+            for index, star_id in enumerate(testing_data["id"])
+            if testing_data[tag][index] is not None
+        )
+
+    @patch("starapp.api.click.echo")
+    def test_add_constellation(
+        self, mock_click_echo: Mock, client: FlaskClient
     ) -> None:
         create_constellations()
 
@@ -246,32 +323,9 @@ class TestAddStar:
                     f"\nStart downloading constellations ({len(LIST_OF_CONSTELLATIONS)})"
                 ),
                 call("Saving constellations in the database..."),
-                call("Creating views for constellations"),
                 call("Constellations have successfully saved in the database"),
             ]
         )
-        constellations = mock_create_views_for_constellation.call_args_list[0][0][0]
-
-        for tag, constellation_model in zip(LIST_OF_CONSTELLATIONS, constellations):
-            assert Constellation.query.get(tag) is not None
-            assert constellation_model.tag == tag
-
-    def test_create_views_for_constellation(self, client: FlaskClient) -> None:
-        create_star_for_test(JsonData.star)
-        constellation: str = JsonData.star[CONSTELLATION]
-        create_views_for_constellation([Constellation(tag=constellation)])
-        star_fields = (RA, DEC, SPECT, "id", CONSTELLATION) + OTHER_DATA
-        star_fields_str = ""
-        for star_field in star_fields:
-            star_fields_str += star_field + ","
-
-        star_fields_str = star_fields_str[:-1]
-        star = [
-            {key: field for key, field in zip(star_fields, row)}
-            for row in db.session.execute(
-                text(f"""SELECT {star_fields_str} FROM stars_with_{constellation};""")
-            )
-        ][0]
-        check_model_fields(Star.query.all()[0], star)
-        db.session.execute(text(f"""DROP VIEW stars_with_{constellation};"""))
-        db.session.commit()
+        assert sorted(
+            constellation.tag for constellation in Constellation.query.all()
+        ) == sorted(LIST_OF_CONSTELLATIONS)
@@ -1,9 +1,20 @@
+import math
+import random
+
+import numpy as np
 from flask.testing import FlaskClient
 
 from starapp.geometry import (
+    CompiledPolygon,
     Graham_scan,
+    SphericalPolygon,
     is_points_range_valid,
+    is_points_range_valid_on_sphere,
     is_polygon_contains_point,
+    normalize_polygon,
+    polygon_contains_points,
+    spherical_Graham_scan,
+    to_unit_vectors,
 )
 from tests.helpers import JsonData
 
@@ -18,6 +29,75 @@ class TestGeometry:
         ):
             assert is_polygon_contains_point(testing_data["points"], ra, dec) == result
 
+    def test_polygon_contains_points(self, client: FlaskClient) -> None:
+        testing_data = JsonData.is_polygon_contains_point
+        data_about_stars = JsonData.data_after_api
+
+        result = polygon_contains_points(
+            testing_data["points"], data_about_stars["ra"], data_about_stars["dec"]
+        )
+        assert list(result) == testing_data["result"]
+
+        polygon = JsonData.get_data_with_points["points"]
+        ra = [point["ra"] for point in JsonData.points]
+        dec = [point["dec"] for point in JsonData.points]
+        assert list(polygon_contains_points(polygon, ra, dec)) == [
+            is_polygon_contains_point(polygon, *point) for point in zip(ra, dec)
+        ]
+
+    def test_compiled_polygon(self, client: FlaskClient) -> None:
+        testing_data = JsonData.is_polygon_contains_point
+        data_about_stars = JsonData.data_after_api
+
+        compiled_polygon = CompiledPolygon(testing_data["points"])
+        assert compiled_polygon.is_simple
+        assert (
+            list(
+                compiled_polygon.contains(
+                    data_about_stars["ra"], data_about_stars["dec"]
+                )
+            )
+            == testing_data["result"]
+        )
+
+    def test_compiled_polygon_with_lasso(self, client: FlaskClient) -> None:
+        random.seed(0)
+        lasso: list[dict[str, float]] = []
+        for i in range(300):
+            angle = 2 * math.pi * i / 300
+            radius = random.uniform(20, 60)
+            lasso.append(
+                {
+                    "ra": 12 + radius * math.cos(angle) / 6,
+                    "dec": radius * math.sin(angle),
+                }
+            )
+        ra = [random.uniform(0, 24) for i in range(5000)] + [
+            point["ra"] for point in lasso
+        ]
+        dec = [random.uniform(-70, 70) for i in range(5000)] + [
+            point["dec"] for point in lasso
+        ]
+
+        compiled_polygon = CompiledPolygon(lasso)
+        assert compiled_polygon.is_simple
+        assert list(compiled_polygon.contains(ra, dec)) == list(
+            polygon_contains_points(lasso, ra, dec)
+        )
+
+    def test_compiled_polygon_with_self_intersection(self, client: FlaskClient) -> None:
+        bowtie: list[dict[str, float]] = [
+            {"ra": ra, "dec": dec} for ra, dec in ((0, 0), (4, 4), (4, 0), (0, 4))
+        ]
+        ra = [1, 3, 2, 2, 0.5]
+        dec = [2, 2, 1, 3, 3]
+
+        compiled_polygon = CompiledPolygon(bowtie)
+        assert not compiled_polygon.is_simple
+        assert list(compiled_polygon.contains(ra, dec)) == list(
+            polygon_contains_points(bowtie, ra, dec)
+        )
+
     def test_is_points_range_valid(self, client: FlaskClient) -> None:
         testing_data = JsonData.is_points_range_valid
         for wrong_data in testing_data["points_with_wrong_range"]:
@@ -36,3 +116,93 @@ class TestGeometry:
             for ra, dec in zip(data_after_api["ra"], data_after_api["dec"])
         ]
         assert Graham_scan(testing_data) == JsonData.Graham_scan
+
+    def test_Graham_scan_does_not_mutate_points(self, client: FlaskClient) -> None:
+        points = JsonData.get_data_with_points["points"]
+        reversed_points = points[::-1]
+        Graham_scan(reversed_points)
+        assert reversed_points == points[::-1]
+
+    def test_Graham_scan_with_collinear_and_duplicate_points(
+        self, client: FlaskClient
+    ) -> None:
+        points: list[dict[str, float]] = [
+            {"ra": ra, "dec": dec}
+            for ra, dec in ((1, 1), (0, 0), (2, 0), (1, 0), (2, 2), (0, 2), (0, 0))
+        ]
+        result = [points[1], points[2], points[4], points[5]]
+        assert Graham_scan(points) == result
+        assert Graham_scan(points[::-1]) == result
+        assert Graham_scan(points[:4]) == [points[1], points[2], points[0]]
+        assert Graham_scan([points[1], points[0], points[4]]) == [points[1], points[4]]
+
+    def test_normalize_polygon(self, client: FlaskClient) -> None:
+        points = JsonData.get_data_with_points["points"]
+        shifted_points = [
+            {"ra": point["ra"] + 1e-9, "dec": point["dec"] - 1e-9}
+            for point in points[2:] + points[:2]
+        ]
+        for on_sphere in (False, True):
+            assert normalize_polygon(
+                points, 6, on_sphere=on_sphere
+            ) == normalize_polygon(shifted_points[::-1], 6, on_sphere=on_sphere)
+
+        assert normalize_polygon(points, 6) == Graham_scan(points)
+
+
+class TestSphericalGeometry:
+    def test_spherical_polygon_with_ra_wrap(self, client: FlaskClient) -> None:
+        points: list[dict[str, float]] = [
+            {"ra": ra, "dec": dec}
+            for ra, dec in ((-1, -20), (1.5, -10), (1, 30), (-0.5, 25))
+        ]
+        rng = np.random.default_rng(0)
+        ra = rng.uniform(0, 24, 5000)
+        dec = rng.uniform(-90, 90, 5000)
+
+        vertices = to_unit_vectors(
+            [point["ra"] for point in points], [point["dec"] for point in points]
+        )
+        normals = np.cross(vertices, np.roll(vertices, -1, axis=0))
+        result = np.all(to_unit_vectors(ra, dec) @ normals.T > 0, axis=1)
+
+        polygon = SphericalPolygon(points)
+        assert np.array_equal(polygon.contains(ra, dec), result)
+        assert np.array_equal(polygon.contains(ra - 24, dec), result)
+        assert 0 < result.sum() < len(result)
+
+    def test_spherical_polygon_around_pole(self, client: FlaskClient) -> None:
+        polygon = SphericalPolygon([{"ra": ra, "dec": 80} for ra in (0, 6, 12, 18)])
+        assert list(polygon.contains([0, 3, 9, 9], [90, 85, 83, 82])) == [
+            True,
+            True,
+            True,
+            False,
+        ]
+        assert polygon.center[1] == 90
+        assert math.isclose(polygon.radius, 10, abs_tol=1e-6)
+
+    def test_is_points_range_valid_on_sphere(self, client: FlaskClient) -> None:
+        for wrong_data in JsonData.is_points_range_valid["points_with_wrong_range"]:
+            assert is_points_range_valid_on_sphere(wrong_data) == False
+
+        assert (
+            is_points_range_valid_on_sphere([{"ra": ra, "dec": 0} for ra in (0, 8, 16)])
+            == False
+        )
+        assert (
+            is_points_range_valid_on_sphere(
+                [{"ra": ra, "dec": -60} for ra in (0, 8, 16)]
+            )
+            == True
+        )
+
+    def test_spherical_Graham_scan(self, client: FlaskClient) -> None:
+        points: list[dict[str, float]] = [
+            {"ra": ra, "dec": dec}
+            for ra, dec in ((23.5, -10), (0, 0), (0.5, -10), (0.5, 10), (23.5, 10))
+        ]
+        result = spherical_Graham_scan(points)
+        assert len(result) == 4
+        assert points[1] not in result
+        assert spherical_Graham_scan(points[::-1]) == result
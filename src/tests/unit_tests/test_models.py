@@ -1,4 +1,5 @@
 from flask.testing import FlaskClient
+from sqlalchemy import text
 
 from models import Catalog, CatalogAssociation, Constellation, Star, db
 from starapp.constants import CATALOGS
@@ -46,3 +47,12 @@ class TestModels:
     def test_star(self, client: FlaskClient) -> None:
         create_star_for_test(JsonData.star)
         check_model_fields(Star.query.all()[0], JsonData.star, "id")
+
+    def test_star_con_index(self, client: FlaskClient) -> None:
+        create_star_for_test(JsonData.star)
+        db.session.execute(text("SET enable_seqscan = off;"))
+        plan = db.session.execute(
+            text("EXPLAIN SELECT id FROM star WHERE con = :tag;"),
+            {"tag": JsonData.star["con"]},
+        ).fetchall()
+        assert "ix_star_con" in "".join(row[0] for row in plan)
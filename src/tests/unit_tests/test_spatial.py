@@ -0,0 +1,169 @@
+from collections import Counter
+
+import numpy as np
+from flask.testing import FlaskClient
+
+from models import Source, db
+from starapp.geometry import (
+    Graham_scan,
+    is_polygon_contains_point,
+    polygon_contains_points,
+    to_unit_vectors,
+)
+from starapp.spatial import (
+    CellStatistics,
+    DeclinationGrid,
+    KDTree,
+    get_data_version,
+    get_star_index,
+)
+from tests.helpers import JsonData, create_data_for_test
+
+
+class TestDeclinationGrid:
+    def test_candidates(self, client: FlaskClient) -> None:
+        data_after_api = JsonData.data_after_api
+        grid = DeclinationGrid(
+            np.array(data_after_api["ra"]), np.array(data_after_api["dec"])
+        )
+
+        assert list(grid.candidates(0, 24, -90, 90)) == list(
+            range(len(data_after_api["ra"]))
+        )
+        assert list(grid.candidates(2, 4, 0, 30)) == [2, 5]
+        assert list(grid.candidates(0, 1, -90, -80)) == []
+
+    def test_candidates_contain_polygon(self, client: FlaskClient) -> None:
+        testing_data = JsonData.is_polygon_contains_point
+        data_after_api = JsonData.data_after_api
+        grid = DeclinationGrid(
+            np.array(data_after_api["ra"]), np.array(data_after_api["dec"])
+        )
+
+        candidates = grid.candidates(1, 12, -40, 40)
+        for index, result in enumerate(testing_data["result"]):
+            if result:
+                assert index in candidates
+
+
+class TestCellStatistics:
+    def test_statistics(self, client: FlaskClient) -> None:
+        rng = np.random.default_rng(2)
+        ra = rng.uniform(0, 24, 20000)
+        dec = np.degrees(np.arcsin(rng.uniform(-1, 1, 20000)))
+        stars = [
+            {"spect": spect, "con": con}
+            for spect, con in zip(
+                rng.choice(np.array(["O", "B", "A", None], dtype=object), 20000),
+                rng.choice(["and", "ori", "uma"], 20000),
+            )
+        ]
+        catalogs_of_stars = [
+            list(rng.choice(["hip", "hd", "hr"], rng.integers(0, 3), replace=False))
+            for i in range(20000)
+        ]
+        cell_statistics = CellStatistics(stars, catalogs_of_stars, ra, dec)
+
+        for size in (3, 10, 100):
+            points = Graham_scan(
+                [
+                    {"ra": float(point_ra), "dec": float(point_dec)}
+                    for point_ra, point_dec in zip(
+                        rng.uniform(-2, 20, size), rng.uniform(-70, 60, size)
+                    )
+                ]
+            )
+            inside = np.nonzero(polygon_contains_points(points, ra, dec))[0]
+            spects: Counter[str] = Counter(stars[index]["spect"] for index in inside)
+            catalogs: Counter[str] = Counter(
+                tag for index in inside for tag in catalogs_of_stars[index]
+            )
+            constellations: Counter[str] = Counter(
+                stars[index]["con"] for index in inside
+            )
+            assert cell_statistics.statistics(points) == (
+                len(inside),
+                spects,
+                catalogs,
+                constellations,
+            )
+
+
+class TestKDTree:
+    def test_query_radius(self, client: FlaskClient) -> None:
+        points = np.random.default_rng(0).uniform(-1, 1, (2000, 3))
+        tree = KDTree(points, leaf_size=8)
+        for center, radius in (((0, 0, 0), 0.5), ((1, 1, 1), 1.2), ((5, 5, 5), 1)):
+            distances = np.linalg.norm(points - center, axis=1)
+            assert list(tree.query_radius(center, radius)) == list(
+                np.nonzero(distances <= radius)[0]
+            )
+
+    def test_query_nearest(self, client: FlaskClient) -> None:
+        points = np.random.default_rng(1).uniform(-1, 1, (2000, 3))
+        tree = KDTree(points, leaf_size=8)
+        for center, k in (((0, 0, 0), 1), ((0.3, -0.2, 0.9), 10), ((9, 9, 9), 25)):
+            distances = np.linalg.norm(points - center, axis=1)
+            indexes, result_distances = tree.query_nearest(center, k)
+            assert list(indexes) == list(np.argsort(distances, kind="stable")[:k])
+            assert np.allclose(result_distances, np.sort(distances)[:k])
+
+    def test_empty_tree(self, client: FlaskClient) -> None:
+        tree = KDTree(np.empty((0, 3)))
+        assert list(tree.query_radius((0, 0, 0), 1)) == []
+        assert list(tree.query_nearest((0, 0, 0), 3)[0]) == []
+
+
+class TestStarIndex:
+    def test_get_star_index(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        star_index = get_star_index()
+        data_after_api = JsonData.data_after_api
+
+        assert [star["id"] for star in star_index.stars] == data_after_api["id"]
+        assert star_index.stars[-1] == JsonData.star
+        assert star_index.catalogs[2] == ["hr", "hd", "hip", "proper", "bf", "gl"]
+        assert get_star_index() is star_index
+
+    def test_reload_after_download(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        star_index = get_star_index()
+        data_version = get_data_version()
+
+        db.session.add(Source(path="hygdata_v3.csv", fingerprint="0" * 64))
+        db.session.commit()
+        assert get_data_version() != data_version
+        assert get_star_index() is not star_index
+        assert get_star_index() is get_star_index()
+
+    def test_candidates(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        star_index = get_star_index()
+        points = JsonData.is_polygon_contains_point["points"]
+
+        assert [
+            star_index.stars[index]["id"]
+            for index in star_index.candidates(points)
+            if is_polygon_contains_point(
+                points, star_index.ra[index], star_index.dec[index]
+            )
+        ] == [star["id"] for star in JsonData.get_data_with_points["stars"]]
+
+    def test_cone(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        star_index = get_star_index()
+        data_after_api = JsonData.data_after_api
+        sirius = data_after_api["id"].index(32263)
+
+        assert list(star_index.cone(6.75, -16.7, 1)) == [sirius]
+        assert list(star_index.cone(0, 90, 180)) == list(
+            range(len(data_after_api["id"]))
+        )
+
+        center = to_unit_vectors(data_after_api["ra"][0], data_after_api["dec"][0])
+        separations = np.degrees(
+            np.arccos(np.clip(star_index.sky_tree.points @ center, -1, 1))
+        )
+        assert list(
+            star_index.cone(data_after_api["ra"][0], data_after_api["dec"][0], 40)
+        ) == list(np.nonzero(separations <= 40)[0])
@@ -1,27 +1,56 @@
 import json
+import math
 from collections import Counter
+from typing import Any
 from unittest.mock import Mock, call, patch
 
+import numpy as np
+import numpy.typing as npt
+from fakeredis import FakeServer, FakeStrictRedis
 from flask import jsonify
 from flask.testing import FlaskClient
-from sqlalchemy import text
 
 from models import Constellation, db
-from starapp.algorithms import Search, TypeSearch
+from starapp.algorithms import (
+    PolygonCache,
+    Search,
+    TypeSearch,
+    load_session_state,
+    save_session_state,
+)
 from starapp.constants import (
     ERROR_CONSTELLATION_DOES_NOT_EXIST,
+    ERROR_IS_NUMBER_OF_POLYGONS_VALID,
+    ERROR_IS_NUMBER_OF_STARS_VALID,
     ERROR_IS_POINTS_RANGE_VALID,
+    ERROR_IS_POINTS_RANGE_VALID_ON_SPHERE,
+    ERROR_IS_RADIUS_RANGE_VALID,
     ERROR_NOT_ENOUGH_POINTS,
+    ERROR_STAR_DOES_NOT_EXIST,
+    MAX_PAGINATION_SIZE,
+    POLYGON_CACHE_PRECISION,
     REDIS_SETTINGS,
 )
+from starapp.geometry import normalize_polygon, to_unit_vectors
+from starapp.spatial import get_data_version
 from starapp.views import (
     _counter_with_percentage,
+    _polygon_hash,
     _result_from_stars_with_constellation_to_dict,
+    _stars_in_polygon_from_index,
+    create_constellation_search,
+    get_constellation_hash_prefix,
     get_hash,
 )
 from tests.helpers import JsonData, create_data_for_test
 
 
+def _set_session_state(client: FlaskClient, state: dict[str, Any]) -> None:
+    with client.session_transaction() as session:
+        session["reference"] = "test_reference"
+    save_session_state("test_reference", state)
+
+
 @patch("starapp.views.render_template")
 class TestMainAndAbout:
     def test_main(self, mock_render_template: Mock, client: FlaskClient) -> None:
@@ -50,103 +79,88 @@ class TestDeleteAll:
         Search.clear(hash_=random_hash)
 
 
+@patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
 class TestGetDataFromConstellation:
-    @patch("starapp.views.Search.__init__")
-    @patch("starapp.views.get_hash")
     @patch("starapp.views._result_from_stars_with_constellation_to_dict")
     def test_get(
         self,
         mock_result_from_stars_with_constellation_to_dict: Mock,
-        mock_hash: Mock,
-        mock_search: Mock,
         client: FlaskClient,
     ) -> None:
         create_data_for_test()
         constellation = JsonData.constellation
-
-        db.session.execute(
-            text(
-                f"""
-            CREATE VIEW stars_with_{constellation['tag']} AS
-                SELECT * FROM star WHERE con='{constellation['tag']}';
-        """
-            )
-        )
-        db.session.commit()
-
-        result_from_stars_with_constellation = [JsonData.star]
-        random_hash = "random_hash"
+        constellation_hash = get_constellation_hash_prefix() + constellation["tag"]
 
         mock_result_from_stars_with_constellation_to_dict.return_value = (
-            result_from_stars_with_constellation,
+            [JsonData.star],
             1,
         )
-        mock_hash.return_value = random_hash
-        mock_search.return_value = None
 
-        response = client.post(
-            "/search_constellation",
-            data=json.dumps(constellation),
-            content_type="application/json",
-        )
+        for _ in range(2):
+            response = client.post(
+                "/search_constellation",
+                data=json.dumps(constellation),
+                content_type="application/json",
+            )
 
-        mock_search.assert_has_calls(
-            [
-                call(
-                    random_hash, type_search, stars=result_from_stars_with_constellation
-                )
-                for type_search in TypeSearch
-            ]
+            with client.session_transaction() as session:
+                assert session["request"] == constellation_hash
+
+            assert JsonData.get_data_from_constellation == response.data.decode("utf-8")
+
+        # The second request attaches the selection built by the first one.
+        mock_result_from_stars_with_constellation_to_dict.assert_called_once_with(
+            constellation["tag"]
         )
+        for type_search in TypeSearch:
+            assert Search(constellation_hash, type_search).length == 1
+        Search.clear(hash_=constellation_hash)
 
-        with client.session_transaction() as session:
-            assert session["request"] == random_hash
+    @patch("starapp.views._result_from_stars_with_constellation_to_dict")
+    def test_rebuild(
+        self,
+        mock_result_from_stars_with_constellation_to_dict: Mock,
+        client: FlaskClient,
+    ) -> None:
+        create_data_for_test()
+        tag = JsonData.constellation["tag"]
+        constellation_hash = get_constellation_hash_prefix() + tag
 
-        db.session.execute(
-            text(
-                f"""
-            DROP VIEW stars_with_{constellation['tag']} CASCADE;
-        """
-            )
+        mock_result_from_stars_with_constellation_to_dict.return_value = (
+            [JsonData.star],
+            1,
         )
-        db.session.commit()
+        assert create_constellation_search(tag) == (constellation_hash, 1)
 
-        assert JsonData.get_data_from_constellation == response.data.decode("utf-8")
-        Search.clear(hash_=random_hash)
+        mock_result_from_stars_with_constellation_to_dict.return_value = ([], 0)
+        assert create_constellation_search(tag) == (constellation_hash, 1)
+        assert create_constellation_search(tag, rebuild=True) == (
+            constellation_hash,
+            0,
+        )
+        assert mock_result_from_stars_with_constellation_to_dict.call_count == 2
+        Search.clear(hash_=constellation_hash)
 
     @patch("starapp.views.Search.clear")
-    @patch("starapp.views.Search.__init__")
-    @patch("starapp.views.get_hash")
     @patch("starapp.views._result_from_stars_with_constellation_to_dict")
     def test_clear_session(
         self,
         mock_result_from_stars_with_constellation_to_dict: Mock,
-        mock_hash: Mock,
-        mock_search: Mock,
         mock_search_clear: Mock,
         client: FlaskClient,
     ) -> None:
         create_data_for_test()
         constellation = JsonData.constellation
 
-        db.session.execute(
-            text(
-                f"""
-            CREATE VIEW stars_with_{constellation['tag']} AS
-                SELECT * FROM star WHERE con='{constellation['tag']}';
-        """
-            )
-        )
-        db.session.commit()
-
         old_hash = "old_hash"
-        new_hash = "new_hash"
+        new_hash = get_constellation_hash_prefix() + constellation["tag"]
         with client.session_transaction() as session:
             session["request"] = old_hash
 
-        mock_result_from_stars_with_constellation_to_dict.return_value = (None, None)
-        mock_hash.return_value = new_hash
-        mock_search.return_value = None
+        mock_result_from_stars_with_constellation_to_dict.return_value = (
+            [JsonData.star],
+            1,
+        )
 
         client.post(
             "/search_constellation",
@@ -154,45 +168,19 @@ class TestGetDataFromConstellation:
             content_type="application/json",
         )
 
-        mock_search_clear.assert_called_once_with(hash_=old_hash)
+        mock_search_clear.assert_has_calls([call(hash_=old_hash), call(hash_=new_hash)])
         with client.session_transaction() as session:
             assert session.get("request") == new_hash
 
-        db.session.execute(
-            text(
-                f"""
-            DROP VIEW stars_with_{constellation['tag']} CASCADE;
-        """
-            )
-        )
-        db.session.commit()
-
     def test_result_from_stars_with_constellation_to_dict(
         self, client: FlaskClient
     ) -> None:
         create_data_for_test()
         constellation = JsonData.constellation
-        db.session.execute(
-            text(
-                f"""
-            CREATE VIEW stars_with_{constellation['tag']} AS
-                SELECT * FROM star WHERE con='{constellation['tag']}';
-        """
-            )
-        )
-        db.session.commit()
         assert _result_from_stars_with_constellation_to_dict(constellation["tag"]) == (
             [JsonData.star],
             1,
         )
-        db.session.execute(
-            text(
-                f"""
-            DROP VIEW stars_with_{constellation['tag']};
-        """
-            )
-        )
-        db.session.commit()
 
     def test_with_not_existing_constellation(self, client: FlaskClient) -> None:
         create_data_for_test()
@@ -278,17 +266,24 @@ class TestGetDataFromConstellation:
         assert get_hash() == hash_
 
 
+@patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
 class TestGetDataWithPoints:
+    def _polygon_hash(
+        self, points: list[dict[str, float]], geometry: str = "flat"
+    ) -> str:
+        return _polygon_hash(
+            normalize_polygon(
+                points, POLYGON_CACHE_PRECISION, on_sphere=geometry == "sphere"
+            ),
+            geometry,
+            get_data_version(),
+        )
+
     @patch("starapp.views.Search.__init__")
-    @patch("starapp.views.get_hash")
-    def test_get(
-        self, mock_get_hash: Mock, mock_search: Mock, client: FlaskClient
-    ) -> None:
+    def test_get(self, mock_search: Mock, client: FlaskClient) -> None:
         create_data_for_test()
         testing_data = JsonData.get_data_with_points
-
-        random_hash: str = "random_hash"
-        mock_get_hash.return_value = random_hash
+        polygon_hash = self._polygon_hash(testing_data["points"])
         mock_search.return_value = None
 
         response = client.post(
@@ -299,23 +294,80 @@ class TestGetDataWithPoints:
 
         mock_search.assert_has_calls(
             [
-                call(random_hash, type_search, stars=testing_data["stars"])
+                call(polygon_hash, type_search, stars=testing_data["stars"])
                 for type_search in TypeSearch
             ]
         )
 
         with client.session_transaction() as session:
-            assert session["request"] == random_hash
+            assert session["request"] == polygon_hash
 
         assert testing_data["result"] == response.data.decode("utf-8")
-        Search.clear(hash_=random_hash)
+        Search.clear(hash_=polygon_hash)
+
+    @patch("starapp.views.POLYGON_SEARCH", "sql")
+    @patch("starapp.views.Search.__init__")
+    def test_get_from_database(self, mock_search: Mock, client: FlaskClient) -> None:
+        create_data_for_test()
+        testing_data = JsonData.get_data_with_points
+        polygon_hash = self._polygon_hash(testing_data["points"])
+        mock_search.return_value = None
+
+        response = client.post(
+            "/search_points",
+            data=json.dumps(testing_data["points"]),
+            content_type="application/json",
+        )
+
+        stars = sorted(testing_data["stars"], key=lambda star: star["id"])
+        mock_search.assert_has_calls(
+            [call(polygon_hash, type_search, stars=stars) for type_search in TypeSearch]
+        )
+
+        result = json.loads(response.data)
+        testing_result = json.loads(testing_data["result"])
+        assert result["number_of_stars"] == testing_result["number_of_stars"]
+        for field in ("catalogs", "spects", "constellations"):
+            assert sorted(result[field], key=str) == sorted(
+                testing_result[field], key=str
+            )
+        Search.clear(hash_=polygon_hash)
+
+    @patch("starapp.views.Search.__init__")
+    def test_get_on_sphere(self, mock_search: Mock, client: FlaskClient) -> None:
+        create_data_for_test()
+        mock_search.return_value = None
+
+        for ra in (19.16, 19.16 - 24):
+            points = [
+                {"ra": ra + delta_ra, "dec": -37.9 + delta_dec}
+                for delta_ra, delta_dec in ((-0.1, -1), (0.1, -1), (0.1, 1), (-0.1, 1))
+            ]
+            response = client.post(
+                "/search_points?geometry=sphere",
+                data=json.dumps(points),
+                content_type="application/json",
+            )
+            polygon_hash = self._polygon_hash(points, "sphere")
+            assert json.loads(response.data)["number_of_stars"] == 1
+            mock_search.assert_any_call(
+                polygon_hash, TypeSearch.DISTANCE, stars=[JsonData.star]
+            )
+            Search.clear(hash_=polygon_hash)
+
+        response = client.post(
+            "/search_points?geometry=sphere",
+            data=json.dumps([{"ra": ra, "dec": 0} for ra in (0, 8, 16)]),
+            content_type="application/json",
+        )
+        assert json.loads(response.data) == {
+            "error": ERROR_IS_POINTS_RANGE_VALID_ON_SPHERE
+        }
 
     @patch("starapp.views.Search.clear")
     @patch("starapp.views.Search.__init__")
-    @patch("starapp.views.get_hash")
     def test_clear_session(
         self,
-        mock_get_hash: Mock,
         mock_search: Mock,
         mock_search_clear: Mock,
         client: FlaskClient,
@@ -324,8 +376,6 @@ class TestGetDataWithPoints:
         testing_data = JsonData.get_data_with_points
 
         old_hash: str = "old_hash"
-        new_hash: str = "new_hash"
-        mock_get_hash.return_value = new_hash
         mock_search.return_value = None
 
         with client.session_transaction() as session:
@@ -337,9 +387,58 @@ class TestGetDataWithPoints:
             content_type="application/json",
         )
 
-        mock_search_clear.assert_called_once_with(hash_=old_hash)
+        mock_search_clear.assert_any_call(hash_=old_hash)
         with client.session_transaction() as session:
-            assert session.get("request") == new_hash
+            assert session.get("request") == self._polygon_hash(testing_data["points"])
+
+    @patch(
+        "starapp.views._stars_in_polygon_from_index",
+        wraps=_stars_in_polygon_from_index,
+    )
+    def test_cache(
+        self, mock_stars_in_polygon_from_index: Mock, client: FlaskClient
+    ) -> None:
+        create_data_for_test()
+        testing_data = JsonData.get_data_with_points
+        polygon_hash = self._polygon_hash(testing_data["points"])
+        redis_ = FakeStrictRedis(server=FakeServer(), decode_responses=True)
+
+        with patch("starapp.algorithms.redis.StrictRedis", lambda **kwargs: redis_):
+            for points in (testing_data["points"], testing_data["points"][::-1]):
+                response = client.post(
+                    "/search_points",
+                    data=json.dumps(points),
+                    content_type="application/json",
+                )
+                assert testing_data["result"] == response.data.decode("utf-8")
+                assert redis_.zcard(polygon_hash + ":references") == 1
+
+            mock_stars_in_polygon_from_index.assert_called_once()
+            client.get("/delete_all")
+            assert redis_.zcard(polygon_hash + ":references") == 0
+            assert redis_.zrange(PolygonCache.RECENT, 0, -1) == [polygon_hash]
+        Search.clear(hash_=polygon_hash)
+
+    @patch("starapp.algorithms.SEARCH_STORAGE", "numpy")
+    def test_without_redis(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        testing_data = JsonData.get_data_with_points
+        polygon_hash = self._polygon_hash(testing_data["points"])
+
+        with patch(
+            "starapp.algorithms.redis.StrictRedis", side_effect=ConnectionError
+        ) as mock_redis:
+            for i in range(2):
+                response = client.post(
+                    "/search_points",
+                    data=json.dumps(testing_data["points"]),
+                    content_type="application/json",
+                )
+                assert testing_data["result"] == response.data.decode("utf-8")
+
+            client.get("/delete_all")
+            mock_redis.assert_not_called()
+        Search.clear(hash_=polygon_hash)
 
     def test_counter_with_percentage(self, client: FlaskClient) -> None:
         testing_data = JsonData.counter_with_percentage
@@ -391,7 +490,289 @@ class TestGetDataWithPoints:
         )
 
 
+class TestGetStatisticsWithPoints:
+    @patch("starapp.views.Search.__init__")
+    def test_get(self, mock_search: Mock, client: FlaskClient) -> None:
+        create_data_for_test()
+        testing_data = JsonData.get_data_with_points
+
+        response = client.post(
+            "/search_points_statistics",
+            data=json.dumps(testing_data["points"]),
+            content_type="application/json",
+        )
+
+        mock_search.assert_not_called()
+        result = json.loads(response.data)
+        testing_result = json.loads(testing_data["result"])
+        assert result["number_of_stars"] == testing_result["number_of_stars"]
+        for field in ("catalogs", "spects", "constellations"):
+            assert sorted(result[field], key=str) == sorted(
+                testing_result[field], key=str
+            )
+
+    def test_errors(self, client: FlaskClient) -> None:
+        for data, result in (
+            ([{"ra": 1, "dec": 1}], {"error": ERROR_NOT_ENOUGH_POINTS}),
+            (
+                [{"ra": 1, "dec": 1}, {"ra": 2, "dec": 100}, {"ra": 3, "dec": 1}],
+                {"error": ERROR_IS_POINTS_RANGE_VALID},
+            ),
+        ):
+            response = client.post(
+                "/search_points_statistics",
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+            assert json.loads(response.data) == result
+
+        response = client.post(
+            "/search_points_statistics",
+            data=json.dumps({"ra": 1}),
+            content_type="application/json",
+        )
+        assert response.status_code == 400
+
+
+@patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
+class TestGetDataWithPolygons:
+    @patch("starapp.views.Search.__init__")
+    @patch("starapp.views.get_hash")
+    def test_get(
+        self, mock_get_hash: Mock, mock_search: Mock, client: FlaskClient
+    ) -> None:
+        create_data_for_test()
+        testing_data = JsonData.get_data_with_points
+        hashes: list[str] = ["first_hash", "second_hash"]
+        mock_get_hash.side_effect = hashes
+        mock_search.return_value = None
+        with client.session_transaction() as session:
+            session["reference"] = "test_reference"
+
+        response = client.post(
+            "/search_points_batch",
+            data=json.dumps(
+                [
+                    testing_data["points"],
+                    JsonData.is_polygon_contains_point["points"][::-1],
+                ]
+            ),
+            content_type="application/json",
+        )
+
+        mock_search.assert_has_calls(
+            [
+                call(hash_, type_search, stars=testing_data["stars"])
+                for hash_ in hashes
+                for type_search in TypeSearch
+            ]
+        )
+        with client.session_transaction() as session:
+            assert "batch" not in session
+            assert session.get("request") is None
+        assert load_session_state("test_reference")["batch"] == hashes
+
+        testing_result = json.loads(testing_data["result"])
+        assert json.loads(response.data) == [
+            {**testing_result, "hash": hash_} for hash_ in hashes
+        ]
+        for hash_ in hashes:
+            Search.clear(hash_=hash_)
+
+    @patch("starapp.views.Search.clear")
+    def test_clear_session(self, mock_search_clear: Mock, client: FlaskClient) -> None:
+        create_data_for_test()
+        with client.session_transaction() as session:
+            session["request"] = "old_hash"
+        _set_session_state(client, {"batch": ["first_hash", "second_hash"]})
+
+        client.get("/delete_all")
+
+        mock_search_clear.assert_has_calls(
+            [call(hash_=hash_) for hash_ in ("old_hash", "first_hash", "second_hash")]
+        )
+        with client.session_transaction() as session:
+            assert session.get("request") is None
+            assert load_session_state(session["reference"]) == {}
+
+    def test_errors(self, client: FlaskClient) -> None:
+        points = JsonData.get_data_with_points["points"]
+        for data in (43, [43], [[{"ra": 15}]]):
+            response = client.post(
+                "/search_points_batch",
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+            assert response.status_code == 400
+
+        for data, error in (
+            ([], ERROR_IS_NUMBER_OF_POLYGONS_VALID),
+            ([points] * 17, ERROR_IS_NUMBER_OF_POLYGONS_VALID),
+            ([points, points[:2]], ERROR_NOT_ENOUGH_POINTS),
+            ([points, [{"ra": 33, "dec": 0}] * 3], ERROR_IS_POINTS_RANGE_VALID),
+        ):
+            response = client.post(
+                "/search_points_batch",
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+            assert f'{{"error":"{error}"}}\n' == response.data.decode("utf-8")
+
+
+@patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
+class TestGetDataWithCone:
+    @patch("starapp.views.Search.__init__")
+    @patch("starapp.views.get_hash")
+    def test_get(
+        self, mock_get_hash: Mock, mock_search: Mock, client: FlaskClient
+    ) -> None:
+        create_data_for_test()
+        random_hash: str = "random_hash"
+        mock_get_hash.return_value = random_hash
+        mock_search.return_value = None
+
+        response = client.post(
+            "/search_cone",
+            data=json.dumps({"ra": 19.16, "dec": -37.9, "radius": 2}),
+            content_type="application/json",
+        )
+
+        mock_search.assert_has_calls(
+            [
+                call(random_hash, type_search, stars=[JsonData.star])
+                for type_search in TypeSearch
+            ]
+        )
+        with client.session_transaction() as session:
+            assert session["request"] == random_hash
+
+        result = json.loads(response.data)
+        testing_result = json.loads(JsonData.get_data_from_constellation)
+        assert result["number_of_stars"] == testing_result["number_of_stars"]
+        for field in ("catalogs", "spects", "constellations"):
+            assert sorted(result[field], key=str) == sorted(
+                testing_result[field], key=str
+            )
+        Search.clear(hash_=random_hash)
+
+    def test_bad_request(self, client: FlaskClient) -> None:
+        for data in (43, {"ra": 1, "dec": 2}, {"ra": "a", "dec": 2, "radius": 1}):
+            response = client.post(
+                "/search_cone", data=json.dumps(data), content_type="application/json"
+            )
+            assert response.status_code == 400
+
+    def test_is_range_valid(self, client: FlaskClient) -> None:
+        for data, error in (
+            ({"ra": 33, "dec": 0, "radius": 1}, ERROR_IS_POINTS_RANGE_VALID),
+            ({"ra": 3, "dec": 0, "radius": 0}, ERROR_IS_RADIUS_RANGE_VALID),
+            ({"ra": 3, "dec": 0, "radius": 181}, ERROR_IS_RADIUS_RANGE_VALID),
+        ):
+            response = client.post(
+                "/search_cone", data=json.dumps(data), content_type="application/json"
+            )
+            assert f'{{"error":"{error}"}}\n' == response.data.decode("utf-8")
+
+
+class TestGetNearestStars:
+    def _nearest(self, position: npt.NDArray[np.float64], number: int) -> list[int]:
+        data_after_api = JsonData.data_after_api
+        positions = to_unit_vectors(data_after_api["ra"], data_after_api["dec"]) * (
+            np.array(data_after_api["dist"]).reshape(-1, 1)
+        )
+        distances = np.linalg.norm(positions - position, axis=1)
+        return [data_after_api["id"][index] for index in np.argsort(distances)[:number]]
+
+    def test_by_id(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        star = JsonData.star
+        position = to_unit_vectors(star["ra"], star["dec"]) * star["dist"]
+
+        response = client.post(
+            "/search_nearest",
+            data=json.dumps({"id": star["id"], "number": 3}),
+            content_type="application/json",
+        )
+        result = json.loads(response.data)
+        assert [star["id"] for star in result] == self._nearest(position, 4)[1:]
+        assert [star["distance"] for star in result] == sorted(
+            star["distance"] for star in result
+        )
+
+        response = client.post(
+            "/search_nearest",
+            data=json.dumps({"id": str(star["id"]), "number": "3"}),
+            content_type="application/json",
+        )
+        assert json.loads(response.data) == result
+
+    def test_by_position(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        position = to_unit_vectors(6.75, -16.7) * 3
+
+        response = client.post(
+            "/search_nearest",
+            data=json.dumps({"ra": 6.75, "dec": -16.7, "dist": 3, "number": 2}),
+            content_type="application/json",
+        )
+        result = json.loads(response.data)
+        assert [star["id"] for star in result] == self._nearest(position, 2)
+
+        response = client.post(
+            "/search_nearest",
+            data=json.dumps({"ra": "6.75", "dec": "-16.7", "dist": "3", "number": 2}),
+            content_type="application/json",
+        )
+        assert json.loads(response.data) == result
+
+        response = client.post(
+            "/search_nearest",
+            data=json.dumps(
+                {"ra": 6.75, "dec": -16.7, "dist": 3, "number": 5, "radius": 30}
+            ),
+            content_type="application/json",
+        )
+        result = json.loads(response.data)
+        assert [star["id"] for star in result] == self._nearest(position, 2)
+        assert all(star["distance"] <= 30 for star in result)
+
+    def test_errors(self, client: FlaskClient) -> None:
+        create_data_for_test()
+        for data in (
+            43,
+            {"id": 1},
+            {"id": 1, "number": "a"},
+            {"id": [32263], "number": 1},
+            {"id": {"id": 32263}, "number": 1},
+            {"ra": "a", "dec": 0, "dist": 1, "number": 1},
+        ):
+            response = client.post(
+                "/search_nearest",
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+            assert response.status_code == 400
+
+        for data, error in (
+            ({"id": 1, "number": 3}, ERROR_STAR_DOES_NOT_EXIST),
+            ({"id": 32263, "number": 0}, ERROR_IS_NUMBER_OF_STARS_VALID),
+            ({"ra": 30, "dec": 0, "dist": 1, "number": 1}, ERROR_IS_POINTS_RANGE_VALID),
+            (
+                {"ra": "30", "dec": "0", "dist": 1, "number": 1},
+                ERROR_IS_POINTS_RANGE_VALID,
+            ),
+        ):
+            response = client.post(
+                "/search_nearest",
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+            assert f'{{"error":"{error}"}}\n' == response.data.decode("utf-8")
+
+
+@patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
 class TestSegmentSearch:
+    @patch("starapp.views.Search.last_search", {}, create=True)
     @patch("starapp.views.Search.segment_search")
     @patch("starapp.views.Search.__init__")
     def test_segment_search(
@@ -413,6 +794,37 @@ class TestSegmentSearch:
             )
             assert response.data.decode("utf-8") == result
 
+    @patch("starapp.views.Search.last_search", {}, create=True)
+    @patch("starapp.views.Search.segment_search")
+    @patch("starapp.views.Search.__init__")
+    def test_hash_from_batch(
+        self, mock__init__: Mock, mock_segment_search: Mock, client: FlaskClient
+    ) -> None:
+        mock__init__.return_value = None
+        mock_segment_search.return_value = JsonData.segment_search[0]["result"]
+        _set_session_state(client, {"batch": ["first_hash", "second_hash"]})
+
+        input_ = JsonData.segment_search[0]["input"]
+        for hash_, status_code in (("second_hash", 200), ("wrong_hash", 400)):
+            response = client.post(
+                "/segment_search",
+                data=json.dumps({"type": "dist", "hash": hash_, **input_}),
+                content_type="application/json",
+            )
+            assert response.status_code == status_code
+        mock__init__.assert_called_once_with("second_hash", TypeSearch.DISTANCE)
+
+    def test_unknown_hash(self, client: FlaskClient) -> None:
+        with client.session_transaction() as session:
+            session["request"] = "expired_hash"
+
+        response = client.post(
+            "/segment_search",
+            data=json.dumps({"type": "dist", **JsonData.segment_search[0]["input"]}),
+            content_type="application/json",
+        )
+        assert response.status_code == 400
+
     def test_hash_is_none(self, client: FlaskClient) -> None:
         input_ = JsonData.segment_search[0]["input"]
         response = client.post(
@@ -435,6 +847,76 @@ class TestSegmentSearch:
         assert response.status_code == 400
 
 
+class TestFilterSearch:
+    @patch("starapp.views.Search.filter_search")
+    @patch("starapp.views.Search.__init__")
+    def test_filter_search(
+        self, mock__init__: Mock, mock_filter_search: Mock, client: FlaskClient
+    ) -> None:
+        mock__init__.return_value = None
+        mock_filter_search.return_value = {
+            "sum": 1,
+            "stars": [{"name": "Alp CrA", "value": 38.432}],
+        }
+        with client.session_transaction() as session:
+            session["request"] = "filter_hash"
+
+        response = client.post(
+            "/filter_search",
+            data=json.dumps(
+                {
+                    "type": "dist",
+                    "page": 2,
+                    "descending": 1,
+                    "filters": {
+                        "mag": {"minimum": 2, "maximum": 6},
+                        "dist": {"maximum": 50},
+                        "absmag": {"minimum": 0, "maximum": None},
+                    },
+                }
+            ),
+            content_type="application/json",
+        )
+
+        assert response.json == mock_filter_search.return_value
+        mock__init__.assert_called_once_with("filter_hash", TypeSearch.DISTANCE)
+        mock_filter_search.assert_called_once_with(
+            {
+                TypeSearch.APPARENT_MAGNITUDE: (2.0, 6.0),
+                TypeSearch.DISTANCE: (-math.inf, 50.0),
+                TypeSearch.ABSOLUTE_MAGNITUDE: (0.0, math.inf),
+            },
+            2,
+            True,
+        )
+
+    @patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
+    def test_bad_request(self, client: FlaskClient) -> None:
+        valid = {"type": "dist", "page": 1, "filters": {"mag": {"maximum": 6}}}
+        for data, hash_ in (
+            (valid, None),
+            (valid, "expired_hash"),
+            ({**valid, "type": "wrong_type"}, "random_hash"),
+            ({**valid, "page": 0}, "random_hash"),
+            ({**valid, "filters": {"wrong_type": {}}}, "random_hash"),
+            ({**valid, "filters": {"mag": {"minimum": "a"}}}, "random_hash"),
+            ({**valid, "filters": ["mag"]}, "random_hash"),
+            ([], "random_hash"),
+        ):
+            with client.session_transaction() as session:
+                session.clear()
+                if hash_ is not None:
+                    session["request"] = hash_
+
+            response = client.post(
+                "/filter_search",
+                data=json.dumps(data),
+                content_type="application/json",
+            )
+            assert response.status_code == 400
+
+
+@patch("starapp.algorithms.redis.StrictRedis", FakeStrictRedis)
 class TestSortSearch:
     @patch("starapp.views.Search.sort_search")
     @patch("starapp.views.Search.__init__")
@@ -456,6 +938,64 @@ class TestSortSearch:
             )
             assert testing_result == response.data.decode("utf-8")
 
+    @patch("starapp.views.Search.cursor_search")
+    @patch("starapp.views.Search.__init__")
+    def test_cursor(
+        self, mock__init__: Mock, mock_cursor_search: Mock, client: FlaskClient
+    ) -> None:
+        mock__init__.return_value = None
+        mock_cursor_search.return_value = {
+            "stars": JsonData.algorithms_search_sort_result[0],
+            "cursor": "a6",
+        }
+        with client.session_transaction() as session:
+            session["request"] = "cursor_hash"
+        _set_session_state(
+            client,
+            {"last_search": {"cursor_hash:dist": {"min_index": 2, "max_index": 8}}},
+        )
+
+        for cursor in (None, "a6"):
+            response = client.post(
+                "/sort_search",
+                data=json.dumps(
+                    {"type": "dist", "descending": 0, "size": 4, "cursor": cursor}
+                ),
+                content_type="application/json",
+            )
+            assert response.json == mock_cursor_search.return_value
+            mock_cursor_search.assert_called_with(
+                cursor=cursor, descending=False, size=4
+            )
+
+    @patch("starapp.views.Search.__init__")
+    def test_wrong_size_and_cursor(
+        self, mock__init__: Mock, client: FlaskClient
+    ) -> None:
+        mock__init__.return_value = None
+        with client.session_transaction() as session:
+            session["request"] = "cursor_hash"
+        _set_session_state(
+            client,
+            {"last_search": {"cursor_hash:dist": {"min_index": 2, "max_index": 8}}},
+        )
+
+        wrong_data: tuple[dict[str, Any], ...] = (
+            {"page": 1, "size": 0},
+            {"page": 1, "size": MAX_PAGINATION_SIZE + 1},
+            {"page": 1, "size": "many"},
+            {"cursor": 6},
+            {"cursor": "x6"},
+            {"cursor": "a-6"},
+        )
+        for data in wrong_data:
+            response = client.post(
+                "/sort_search",
+                data=json.dumps({"type": "dist", "descending": 0, **data}),
+                content_type="application/json",
+            )
+            assert response.status_code == 400
+
     def test_error_type(self, client: FlaskClient) -> None:
         with client.session_transaction() as session:
             session["request"] = "random_hash"